@@ -2,46 +2,215 @@
 Automated underwriting agent using Claude for risk assessment and premium calculation.
 """
 
+import io
 import os
-import json
 import uuid
-from typing import Dict, List, Optional, Any, Union
+import asyncio
+import random
+import weakref
+import orjson
+import aiofiles
+from typing import Dict, List, Optional, Any, Tuple, Union
 from datetime import datetime
+from types import MappingProxyType
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from functools import lru_cache
+import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
-from anthropic import Anthropic
-from pydantic import BaseModel, Field
-from fastapi import FastAPI, HTTPException
+import httpx
+from anthropic import APIConnectionError, APIStatusError, AsyncAnthropic, DefaultAsyncHttpxClient
+from pydantic import TypeAdapter, ValidationError
+from fastapi import Body, FastAPI
+from fastapi.exceptions import RequestValidationError
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from .report_generator import QuoteReportGenerator
+from .batch import QuoteBatcher
+from .cache import DEFAULT_CACHE_DIR, DEFAULT_TTL as DEFAULT_CACHE_TTL, AnalysisCache
+from .fs import ensure_dir
+from .rate_limiter import AnthropicRateLimiter
+from .pricing_kernels import (
+    BASE_RATES,
+    DEFAULT_BASE_RATE,
+    EMPLOYEE_FACTORS,
+    EMPLOYEE_THRESHOLDS,
+    REVENUE_FACTORS,
+    REVENUE_THRESHOLDS,
+    YEARS_FACTORS,
+    YEARS_THRESHOLDS,
+    bucket_factor,
+    claims_factor_vec,
+)
 from .models import PolicyRequest, Claim
+from .claude_context import (
+    POLICY_ANALYSIS_INSTRUCTIONS,
+    POLICY_ANALYSIS_SYSTEM_PROMPT,
+    POLICY_ANALYSIS_TOOL,
+    POLICY_BATCH_ANALYSIS_INSTRUCTIONS,
+    POLICY_BATCH_ANALYSIS_TOOL,
+    RISK_EVALUATION_INSTRUCTIONS,
+    RISK_EVALUATION_SYSTEM_PROMPT,
+    RISK_EVALUATION_TOOL,
+    cached_text_block,
+    forced_tool_choice,
+)
 
-# Load environment variables
-load_dotenv()
-
-# Get API key and model from environment
-ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
-CLAUDE_MODEL = os.getenv("CLAUDE_MODEL", "claude-3-sonnet-20240229")  # Default to latest model if not specified
-
-if not ANTHROPIC_API_KEY:
-    raise ValueError("ANTHROPIC_API_KEY environment variable is required")
-
-class PolicyRequest(BaseModel):
-    """Structure for incoming policy quote requests"""
-    business_name: str
-    business_type: str
-    annual_revenue: float
-    employee_count: int
-    state: str
-    city: str
-    years_in_business: int
-    business_description: str
-    claims_history: List[Dict[str, Any]]
-    additional_notes: Optional[str] = None
+# Model used when CLAUDE_MODEL is not set
+CLAUDE_MODEL = "claude-3-sonnet-20240229"
+
+@lru_cache(maxsize=1)
+def _load_env() -> None:
+    """Load the .env file once, on first use rather than at import."""
+    load_dotenv()
+
+def _settings() -> Tuple[Optional[str], str]:
+    """Get the API key and model from the environment."""
+    _load_env()
+    return os.getenv("ANTHROPIC_API_KEY"), os.getenv("CLAUDE_MODEL", CLAUDE_MODEL)
+
+# Report styles, built once and shared by every generated PDF
+_STYLES = getSampleStyleSheet()
+_TITLE_STYLE = _STYLES['Heading1']
+_HEADING_STYLE = _STYLES['Heading2']
+_NORMAL_STYLE = _STYLES['Normal']
+_RISK_STYLES = MappingProxyType({
+    'high': ParagraphStyle('RiskStyleHigh', parent=_NORMAL_STYLE, textColor=colors.red),
+    'medium': ParagraphStyle('RiskStyleMedium', parent=_NORMAL_STYLE, textColor=colors.orange),
+    'low': ParagraphStyle('RiskStyleLow', parent=_NORMAL_STYLE, textColor=colors.green)
+})
+_TABLE_STYLE_HEADER = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+])
+
+@lru_cache(maxsize=1)
+def _pdf_pool() -> ProcessPoolExecutor:
+    """Get the worker processes for PDF rendering, started on first use."""
+    return ProcessPoolExecutor(max_workers=os.cpu_count())
+
+def _shutdown_pdf_pool() -> None:
+    """Stop the PDF workers; the next report starts a new pool."""
+    if _pdf_pool.cache_info().currsize:
+        _pdf_pool().shutdown()
+        _pdf_pool.cache_clear()
+
+# HTTP/2 connection pools shared by every agent's Anthropic clients, one per event loop
+_HTTP_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+def _http_client() -> httpx.AsyncClient:
+    """Get the running loop's HTTP/2 connection pool, creating it on first use.
+    
+    Pooled connections belong to the loop that opened them, so each loop
+    gets its own pool, and a pool closed at app shutdown is replaced.
+    """
+    loop = asyncio.get_running_loop()
+    client = _HTTP_CLIENTS.get(loop)
+    if client is None or client.is_closed:
+        client = _HTTP_CLIENTS[loop] = DefaultAsyncHttpxClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+            timeout=60
+        )
+    return client
+
+async def _close_http_client() -> None:
+    """Close the running loop's HTTP connection pool, if it has one."""
+    client = _HTTP_CLIENTS.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+# Cap on in-flight Anthropic requests shared by every agent in the process
+MAX_CONCURRENT_REQUESTS = 8
+_LLM_SEMAPHORES: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+def _llm_semaphore() -> asyncio.Semaphore:
+    """Get the running loop's request semaphore, creating it on first use.
+    
+    Semaphores bind to the loop they're first awaited on, so each loop
+    (e.g. one per CLI asyncio.run call) gets its own.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _LLM_SEMAPHORES.get(loop)
+    if semaphore is None:
+        semaphore = _LLM_SEMAPHORES[loop] = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    return semaphore
+
+# Retry policy for transient Anthropic failures (rate limits, overload, 5xx)
+LLM_MAX_ATTEMPTS = 3
+LLM_BACKOFF_MIN = 1.0
+LLM_BACKOFF_MAX = 30.0
+
+@lru_cache(maxsize=1)
+def _default_rate_limiter() -> Optional[AnthropicRateLimiter]:
+    """Get the process-wide limiter sized from ANTHROPIC_RPM and ANTHROPIC_TPM, if set."""
+    _load_env()
+    rpm, tpm = os.getenv("ANTHROPIC_RPM"), os.getenv("ANTHROPIC_TPM")
+    if not (rpm or tpm):
+        return None
+    return AnthropicRateLimiter(float(rpm) if rpm else None, float(tpm) if tpm else None)
+
+def _estimate_input_tokens(params: Dict[str, Any]) -> int:
+    """Roughly estimate a request's input tokens (1 token ≈ 4 characters).
+    
+    Counted locally: an exact count would cost a count_tokens round-trip
+    per call, which is itself rate limited.
+    """
+    text = orjson.dumps([params.get("system"), params.get("messages"), params.get("tools")])
+    return len(text) // 4
+
+def _is_retryable(error: Exception) -> bool:
+    """Check whether an Anthropic error is worth retrying."""
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, APIConnectionError)
+
+# Policy requests analyzed together in one prompt by process_request_batch;
+# larger groups need long generations that risk timing out
+REQUESTS_PER_PROMPT = 8
+MAX_REQUESTS_PER_PROMPT = 8
+
+# Read timeout for each request's share of a grouped analysis, in seconds
+GROUP_TIMEOUT_PER_REQUEST = 60
+
+# Special conditions attached to a quote by risk profile, business type and claims
+_HIGH_RISK_CONDITIONS = (
+    "Monthly safety inspections required",
+    "Employee training program implementation",
+    "Security system installation",
+    "Regular risk assessment reviews"
+)
+_BUSINESS_TYPE_CONDITIONS = MappingProxyType({
+    'restaurant': (
+        "Food safety certification required",
+        "Regular kitchen equipment maintenance",
+        "Employee hygiene training"
+    ),
+    'manufacturing': (
+        "Equipment safety inspections",
+        "Worker safety training",
+        "Emergency response plan"
+    )
+})
+_CLAIMS_CONDITIONS = (
+    "Claims review every 6 months",
+    "Risk mitigation plan required"
+)
 
 class UnderwritingAgent:
     """Agent for processing insurance quotes."""
@@ -49,33 +218,81 @@ class UnderwritingAgent:
     def __init__(self, config: Optional[Dict] = None):
         """Initialize the agent with configuration."""
         self.config = config or {}
-        self.api_key = os.getenv('ANTHROPIC_API_KEY')
+        self.api_key, self.model = _settings()
         if not self.api_key:
             raise ValueError("ANTHROPIC_API_KEY not found in environment variables")
         
-        self.model = os.getenv('CLAUDE_MODEL', CLAUDE_MODEL)
-        self.client = Anthropic(api_key=self.api_key)
+        # Opt-in cache of Claude's analyses for repeated identical requests
+        self.cache = (
+            AnalysisCache(self.config.get('cache_dir', DEFAULT_CACHE_DIR),
+                          ttl=self.config.get('cache_ttl', DEFAULT_CACHE_TTL))
+            if self.config.get('cache') else None
+        )
+        
+        # Client-side RPM/TPM budget, shared by every agent unless configured
+        rpm, tpm = self.config.get('rpm'), self.config.get('tpm')
+        self.rate_limiter = AnthropicRateLimiter(rpm, tpm) if rpm or tpm else _default_rate_limiter()
+        
+        # Anthropic clients by event loop, created on first use; see client
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncAnthropic]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._client: Optional[AsyncAnthropic] = None
+    
+    @property
+    def client(self) -> AsyncAnthropic:
+        """Get the Anthropic client for the running event loop.
+        
+        Each loop's client uses that loop's shared connection pool. A client
+        assigned to this property is used on every loop instead.
+        """
+        if self._client is not None:
+            return self._client
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed():
+            # Retries are handled by _create_message so they respect the semaphore
+            client = self._clients[loop] = AsyncAnthropic(
+                api_key=self.api_key, http_client=_http_client(), max_retries=0
+            )
+        return client
+    
+    @client.setter
+    def client(self, client: AsyncAnthropic) -> None:
+        self._client = client
+    
+    async def _create_message(self, **kwargs: Any) -> Any:
+        """Send a request to Claude, bounded by the shared concurrency limit.
+        
+        Each attempt first waits for the agent's rate limiter, if any, so
+        calls are spread under the API's limits instead of hitting 429s.
+        Transient failures are retried with jittered exponential backoff; other
+        errors are raised immediately.
+        """
+        n_tokens = _estimate_input_tokens(kwargs) if self.rate_limiter else 0
+        for attempt in range(LLM_MAX_ATTEMPTS):
+            try:
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.acquire(n_tokens)
+                async with _llm_semaphore():
+                    return await self.client.messages.create(**kwargs)
+            except Exception as e:
+                if attempt == LLM_MAX_ATTEMPTS - 1 or not _is_retryable(e):
+                    raise
+            # Back off outside the semaphore so waiting retries don't hold a slot
+            delay = min(LLM_BACKOFF_MAX, LLM_BACKOFF_MIN * 2 ** attempt)
+            await asyncio.sleep(random.uniform(delay / 2, delay))
     
     def _parse_claude_response(self, response: Any) -> Dict[str, Any]:
-        """Parse Claude's response into a dictionary."""
+        """Extract Claude's structured tool input from the response."""
         try:
-            # Extract the text content from the response
-            text = response.content[0].text
-            
-            # Try to find JSON content between triple backticks if present
-            if "```json" in text:
-                text = text.split("```json")[1].split("```")[0].strip()
-            elif "```" in text:
-                text = text.split("```")[1].strip()
-            
-            # Parse the JSON
-            return json.loads(text)
-        except (json.JSONDecodeError, IndexError, AttributeError) as e:
-            print(f"Error parsing Claude response: {e}")
+            return next(block.input for block in response.content if block.type == "tool_use")
+        except (StopIteration, TypeError, AttributeError) as e:
+            print(f"Error parsing Claude response: {e!r}")
             print(f"Raw response: {response}")
             raise ValueError("Failed to parse Claude's response")
     
-    def evaluate_risk(self, request: Union[PolicyRequest, Dict[str, Any]]) -> Dict[str, Any]:
+    async def evaluate_risk(self, request: Union[PolicyRequest, Dict[str, Any]]) -> Dict[str, Any]:
         """Evaluate the risk profile of a policy request."""
         # Convert dict to PolicyRequest if needed
         if isinstance(request, dict):
@@ -83,8 +300,6 @@ class UnderwritingAgent:
         
         # Create a prompt for risk evaluation
         prompt = f"""
-        Evaluate the risk profile for this business:
-        
         Business: {request.business_name}
         Type: {request.business_type}
         Revenue: ${request.annual_revenue:,.2f}
@@ -94,52 +309,52 @@ class UnderwritingAgent:
         Description: {request.business_description}
         
         Claims History:
-        {json.dumps(request.claims_history, indent=2)}
-        
-        Please provide a JSON response with:
-        1. risk_profile (low/medium/high)
-        2. risk_factors (list of specific factors)
-        3. risk_score (0-100)
-        
-        Format your response as valid JSON.
+        {orjson.dumps(request.dumped['claims_history']).decode()}
         """
         
-        # Get Claude's analysis
-        response = self.client.messages.create(
+        # Get Claude's analysis; the static system prompt and instructions are
+        # sent ahead of the business details so they form a cacheable prefix
+        response = await self._create_message(
             model=self.model,
             max_tokens=1000,
             temperature=0.7,
-            system="You are an expert insurance underwriter. Evaluate the business risk profile. Always respond with valid JSON.",
+            tools=[RISK_EVALUATION_TOOL],
+            tool_choice=forced_tool_choice(RISK_EVALUATION_TOOL),
+            system=[cached_text_block(RISK_EVALUATION_SYSTEM_PROMPT)],
             messages=[{
                 "role": "user",
-                "content": prompt
+                "content": [
+                    cached_text_block(RISK_EVALUATION_INSTRUCTIONS),
+                    {"type": "text", "text": prompt}
+                ]
             }]
         )
         
         return self._parse_claude_response(response)
     
-    def make_decision(self, request: PolicyRequest) -> Dict[str, Any]:
+    async def make_decision(self, request: PolicyRequest) -> Dict[str, Any]:
         """Make an underwriting decision for a policy request."""
         try:
             # Get risk evaluation
-            risk_evaluation = self.evaluate_risk(request)
+            risk_evaluation = await self.evaluate_risk(request)
             
             # Calculate premium
-            premium = self._calculate_premium(request)
+            premium, factors = self._calculate_premium(request)
+            
+            # Generate quote ID; the same timestamp and suffix name the report
+            now = datetime.now()
+            suffix = uuid.uuid4().hex[:8]
+            quote_id = f"QUOTE_{now.strftime('%Y%m%d_%H%M%S')}_{suffix}"
             
-            # Generate quote ID
-            quote_id = f"QUOTE_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            # Derive conditions and explanation once for both report and response
+            conditions = self._determine_conditions(request, risk_evaluation)
+            explanation = self._generate_explanation(request, risk_evaluation, premium, factors)
             
             # Generate report
-            report_path = self._generate_report(request, risk_evaluation, {
-                'quote_id': quote_id,
-                'risk_profile': risk_evaluation['risk_profile'],
-                'risk_factors': risk_evaluation['risk_factors'],
-                'risk_score': risk_evaluation['risk_score'],
-                'premium_estimate': premium,
-                'conditions': self._determine_conditions(request, risk_evaluation),
-                'explanation': self._generate_explanation(request, risk_evaluation, premium)
-            })
+            report_path = await self._generate_report_async(
+                request, risk_evaluation, premium, factors=factors, generated_at=now,
+                report_id=suffix
+            )
             
             return {
                 'business_name': request.business_name,
@@ -148,44 +363,147 @@ class UnderwritingAgent:
                 'risk_factors': risk_evaluation['risk_factors'],
                 'risk_score': risk_evaluation['risk_score'],
                 'premium_estimate': premium,
-                'conditions': self._determine_conditions(request, risk_evaluation),
-                'explanation': self._generate_explanation(request, risk_evaluation, premium),
+                'conditions': conditions,
+                'explanation': explanation,
                 'report_path': report_path
             }
             
         except Exception as e:
             raise Exception(f"Failed to make decision: {str(e)}")
     
-    def process_policy_request(self, request: PolicyRequest) -> Dict:
+    async def process_policy_request(self, request: PolicyRequest) -> Dict:
         """Process a policy request and generate a quote."""
         # Generate a unique quote ID
         quote_id = str(uuid.uuid4())
         
-        # Create the prompt for Claude
-        prompt = self._create_analysis_prompt(request)
+        params = self._analysis_params(request)
+        key = self.cache.key(params) if self.cache else None
+        analysis = await self.cache.get(key) if self.cache else None
+        
+        if analysis is None:
+            # Get Claude's analysis
+            response = await self._create_message(**params)
+            
+            # Parse Claude's response
+            analysis = self._parse_claude_response(response)
+            if self.cache:
+                await self.cache.set(key, analysis)
+        
+        return await self._build_quote(quote_id, request, analysis)
+    
+    async def process_request_batch(self, requests: List[PolicyRequest],
+                                    k: int = REQUESTS_PER_PROMPT) -> List[Dict]:
+        """Process several policy requests, analyzing up to k per Claude call.
+        
+        Requests share one system prompt and instruction prefix per call, so
+        fewer round-trips and prefix tokens are spent than with one call per
+        request. k is capped at MAX_REQUESTS_PER_PROMPT. Analyses are cached
+        under the same keys process_policy_request uses, and quotes are
+        returned in request order.
+        """
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        k = min(k, MAX_REQUESTS_PER_PROMPT)
+        
+        # Serve what we can from the cache and group the rest into prompts
+        analyses: List[Optional[Dict]] = [None] * len(requests)
+        keys: List[Optional[str]] = [None] * len(requests)
+        pending = []
+        for i, request in enumerate(requests):
+            if self.cache:
+                keys[i] = self.cache.key(self._analysis_params(request))
+                analyses[i] = await self.cache.get(keys[i])
+            if analyses[i] is None:
+                pending.append(i)
+        
+        groups = [pending[i:i + k] for i in range(0, len(pending), k)]
+        results = await asyncio.gather(
+            *(self._analyze_group([requests[i] for i in group]) for group in groups)
+        )
+        for group, group_analyses in zip(groups, results):
+            for i, analysis in zip(group, group_analyses):
+                if analysis is not None and self.cache:
+                    await self.cache.set(keys[i], analysis)
+                analyses[i] = analysis
+        
+        async def quote(i: int) -> Dict:
+            if analyses[i] is None:
+                # Claude left this request out of its batched answer
+                return await self.process_policy_request(requests[i])
+            return await self._build_quote(str(uuid.uuid4()), requests[i], analyses[i])
+        
+        return list(await asyncio.gather(*(quote(i) for i in range(len(requests)))))
+    
+    async def _analyze_group(self, requests: List[PolicyRequest]) -> List[Optional[Dict]]:
+        """Get Claude's analyses of a group of requests in a single call.
+        
+        An entry is None when the response has no analysis for that request.
+        """
+        if len(requests) == 1:
+            response = await self._create_message(**self._analysis_params(requests[0]))
+            return [self._parse_claude_response(response)]
         
-        # Get Claude's analysis
-        response = self.client.messages.create(
+        prompt = "\n".join(
+            f'<request id="{i}">{self._create_analysis_prompt(request)}</request>'
+            for i, request in enumerate(requests, 1)
+        )
+        response = await self._create_message(
             model=self.model,
-            max_tokens=1000,
+            max_tokens=1000 * len(requests),
+            # Generation time grows with the group, so scale the timeout with it
+            timeout=GROUP_TIMEOUT_PER_REQUEST * len(requests),
             temperature=0.7,
-            system="You are an expert insurance underwriter. Analyze the business details and provide a risk assessment and premium estimate. Always respond with valid JSON.",
+            tools=[POLICY_BATCH_ANALYSIS_TOOL],
+            tool_choice=forced_tool_choice(POLICY_BATCH_ANALYSIS_TOOL),
+            system=[cached_text_block(POLICY_ANALYSIS_SYSTEM_PROMPT)],
             messages=[{
                 "role": "user",
-                "content": prompt
+                "content": [
+                    cached_text_block(POLICY_BATCH_ANALYSIS_INSTRUCTIONS),
+                    {"type": "text", "text": prompt}
+                ]
             }]
         )
         
-        # Parse Claude's response
-        analysis = self._parse_claude_response(response)
+        by_id = {}
+        for analysis in self._parse_claude_response(response).get("analyses", []):
+            analysis = dict(analysis)
+            by_id[str(analysis.pop("request_id", ""))] = analysis
+        return [by_id.get(str(i)) for i in range(1, len(requests) + 1)]
+    
+    def _analysis_params(self, request: PolicyRequest) -> Dict[str, Any]:
+        """Build the messages.create arguments for a policy analysis."""
+        # Create the prompt for Claude
+        prompt = self._create_analysis_prompt(request)
         
+        return {
+            "model": self.model,
+            "max_tokens": 1000,
+            "temperature": 0.7,
+            "tools": [POLICY_ANALYSIS_TOOL],
+            "tool_choice": forced_tool_choice(POLICY_ANALYSIS_TOOL),
+            "system": [cached_text_block(POLICY_ANALYSIS_SYSTEM_PROMPT)],
+            "messages": [{
+                "role": "user",
+                "content": [
+                    cached_text_block(POLICY_ANALYSIS_INSTRUCTIONS),
+                    {"type": "text", "text": prompt}
+                ]
+            }]
+        }
+    
+    async def _build_quote(self, quote_id: str, request: PolicyRequest, analysis: Dict) -> Dict:
+        """Price a policy from Claude's analysis and assemble the quote response."""
         # Calculate premium
         base_rate = self._calculate_base_rate(request.business_type)
         adjustment_factor = self._calculate_adjustment_factor(request, analysis)
         premium = base_rate * adjustment_factor
         
         # Generate report
-        report_path = self._generate_report(request, analysis, premium)
+        now = datetime.now()
+        report_path = await self._generate_report_async(
+            request, analysis, premium, generated_at=now, report_id=quote_id
+        )
         
         # Prepare response
         return {
@@ -195,14 +513,12 @@ class UnderwritingAgent:
             "risk_profile": analysis.get("risk_profile", "unknown"),
             "risk_factors": analysis.get("risk_factors", []),
             "report_path": report_path,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now.isoformat()
         }
     
     def _create_analysis_prompt(self, request: PolicyRequest) -> str:
-        """Create the prompt for Claude's analysis."""
+        """Create the business-specific part of the prompt for Claude's analysis."""
         return f"""
-        Please analyze this business for insurance underwriting:
-        
         Business: {request.business_name}
         Type: {request.business_type}
         Revenue: ${request.annual_revenue:,.2f}
@@ -212,88 +528,52 @@ class UnderwritingAgent:
         Description: {request.business_description}
         
         Claims History:
-        {json.dumps(request.claims_history, indent=2)}
+        {orjson.dumps(request.dumped['claims_history']).decode()}
         
         Additional Notes: {request.additional_notes}
-        
-        Please provide a JSON response with:
-        1. risk_profile (low/medium/high)
-        2. risk_factors (list of specific factors)
-        3. recommendations (list of risk mitigation steps)
-        
-        Format your response as valid JSON.
         """
     
     def _calculate_base_rate(self, business_type: str) -> float:
         """Calculate the base rate for a business type."""
-        base_rates = {
-            'restaurant': 5000,
-            'retail': 4000,
-            'manufacturing': 8000,
-            'construction': 10000,
-            'professional_services': 3000
-        }
-        return base_rates.get(business_type.lower(), 5000)
+        return BASE_RATES.get(business_type, DEFAULT_BASE_RATE)
 
     def _calculate_revenue_factor(self, annual_revenue: float) -> float:
         """Calculate the revenue adjustment factor."""
-        if annual_revenue < 500000:
-            return 0.8
-        elif annual_revenue < 1000000:
-            return 1.0
-        elif annual_revenue < 2000000:
-            return 1.2
-        else:
-            return 1.5
+        return float(bucket_factor(REVENUE_THRESHOLDS, REVENUE_FACTORS, annual_revenue))
 
     def _calculate_employee_factor(self, employee_count: int) -> float:
         """Calculate the employee count adjustment factor."""
-        if employee_count < 10:
-            return 0.8
-        elif employee_count < 25:
-            return 1.0
-        elif employee_count < 50:
-            return 1.2
-        else:
-            return 1.5
-
-    def _calculate_claims_factor(self, claims_history: List[Dict[str, Any]]) -> float:
+        return float(bucket_factor(EMPLOYEE_THRESHOLDS, EMPLOYEE_FACTORS, employee_count))
+
+    def _calculate_claims_factor(self, claim_amounts: np.ndarray) -> float:
         """Calculate the claims history adjustment factor."""
-        if not claims_history:
-            return 0.9
-        
-        total_claims = len(claims_history)
-        total_amount = sum(claim.get('amount', 0) for claim in claims_history)
-        
-        if total_claims == 1 and total_amount < 5000:
-            return 1.1
-        elif total_claims == 1:
-            return 1.2
-        elif total_claims == 2:
-            return 1.3
-        else:
-            return 1.5
+        return float(claims_factor_vec(claim_amounts.size, claim_amounts.sum()))
 
     def _calculate_years_factor(self, years_in_business: int) -> float:
         """Calculate the years in business adjustment factor."""
-        if years_in_business < 2:
-            return 1.2
-        elif years_in_business < 5:
-            return 1.1
-        elif years_in_business < 10:
-            return 1.0
-        else:
-            return 0.9
-
-    def _calculate_premium(self, request: PolicyRequest) -> float:
-        """Calculate the final premium estimate."""
-        base_rate = self._calculate_base_rate(request.business_type)
-        revenue_factor = self._calculate_revenue_factor(request.annual_revenue)
-        employee_factor = self._calculate_employee_factor(request.employee_count)
-        claims_factor = self._calculate_claims_factor(request.claims_history)
-        years_factor = self._calculate_years_factor(request.years_in_business)
-        
-        return base_rate * revenue_factor * employee_factor * claims_factor * years_factor
+        return float(bucket_factor(YEARS_THRESHOLDS, YEARS_FACTORS, years_in_business))
+
+    def _premium_factors(self, request: PolicyRequest) -> Dict[str, float]:
+        """Calculate the base rate and each premium adjustment factor."""
+        return {
+            'base_rate': self._calculate_base_rate(request.business_type),
+            'revenue_factor': self._calculate_revenue_factor(request.annual_revenue),
+            'employee_factor': self._calculate_employee_factor(request.employee_count),
+            'claims_factor': self._calculate_claims_factor(request.claim_amounts),
+            'years_factor': self._calculate_years_factor(request.years_in_business)
+        }
+
+    def _calculate_premium(self, request: PolicyRequest) -> Tuple[float, Dict[str, float]]:
+        """Calculate the final premium estimate and the factors behind it."""
+        factors = self._premium_factors(request)
+        premium = (
+            factors['base_rate']
+            * factors['revenue_factor']
+            * factors['employee_factor']
+            * factors['claims_factor']
+            * factors['years_factor']
+        )
+        return premium, factors
     
     def _calculate_adjustment_factor(self, request: PolicyRequest, analysis: Dict) -> float:
         """Calculate the adjustment factor based on risk profile and other factors."""
@@ -317,234 +597,76 @@ class UnderwritingAgent:
         
         return factor
     
-    def _generate_report(self, request: PolicyRequest, analysis: Dict, premium: float) -> str:
-        """Generate a detailed PDF report."""
+    def _report_args(self, request: PolicyRequest, analysis: Dict, premium: float,
+                     factors: Optional[Dict[str, float]] = None,
+                     generated_at: Optional[datetime] = None,
+                     report_id: Optional[str] = None) -> Tuple[str, tuple]:
+        """Pick the report path and precompute everything _render_pdf needs.
+        
+        The path includes report_id (a fresh UUID if omitted) so quotes
+        generated in the same second don't overwrite each other's reports.
+        """
+        generated_at = generated_at or datetime.now()
+        
         # Create reports directory if it doesn't exist
-        os.makedirs("reports", exist_ok=True)
+        ensure_dir("reports")
         
         # Generate report filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        report_path = f"reports/quote_{timestamp}.pdf"
-        
-        # Create the PDF document
-        doc = SimpleDocTemplate(
-            report_path,
-            pagesize=letter,
-            rightMargin=72,
-            leftMargin=72,
-            topMargin=72,
-            bottomMargin=72
-        )
-        
-        # Get styles
-        styles = getSampleStyleSheet()
-        title_style = styles['Heading1']
-        heading_style = styles['Heading2']
-        normal_style = styles['Normal']
-        
-        # Create custom styles
-        risk_style = ParagraphStyle(
-            'RiskStyle',
-            parent=normal_style,
-            textColor=colors.red if analysis.get('risk_profile') == 'high' else
-                     colors.orange if analysis.get('risk_profile') == 'medium' else
-                     colors.green
-        )
-        
-        # Build the document
-        story = []
+        timestamp = generated_at.strftime("%Y%m%d_%H%M%S")
+        report_path = f"reports/quote_{timestamp}_{report_id or uuid.uuid4().hex}.pdf"
         
-        # Title
-        story.append(Paragraph(f"Insurance Quote Report for {request.business_name}", title_style))
-        story.append(Spacer(1, 12))
-        
-        # Quote Details
-        story.append(Paragraph("Quote Details", heading_style))
-        story.append(Spacer(1, 6))
-        
-        quote_data = [
-            ["Business Name:", request.business_name],
-            ["Business Type:", request.business_type],
-            ["Annual Revenue:", f"${request.annual_revenue:,.2f}"],
-            ["Employee Count:", str(request.employee_count)],
-            ["Location:", f"{request.city}, {request.state}"],
-            ["Years in Business:", str(request.years_in_business)],
-            ["Premium Estimate:", f"${premium:,.2f}"],
-            ["Risk Profile:", analysis.get('risk_profile', 'unknown')],
-            ["Generated On:", datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
-        ]
-        
-        quote_table = Table(quote_data, colWidths=[2*inch, 4*inch])
-        quote_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ]))
-        story.append(quote_table)
-        story.append(Spacer(1, 12))
-        
-        # Premium Calculation Breakdown
-        story.append(Paragraph("Premium Calculation Breakdown", heading_style))
-        story.append(Spacer(1, 6))
-        
-        # Calculate factors
-        base_rate = self._calculate_base_rate(request.business_type)
-        revenue_factor = self._calculate_revenue_factor(request.annual_revenue)
-        employee_factor = self._calculate_employee_factor(request.employee_count)
-        claims_factor = self._calculate_claims_factor(request.claims_history)
-        years_factor = self._calculate_years_factor(request.years_in_business)
-        
-        # Create calculation table
-        calc_data = [
-            ["Factor", "Value", "Explanation"],
-            ["Base Rate", f"${base_rate:,.2f}", f"Standard rate for {request.business_type.title()} businesses"],
-            ["Revenue Factor", f"{revenue_factor:.2f}x", f"Based on annual revenue of ${request.annual_revenue:,.2f}"],
-            ["Employee Factor", f"{employee_factor:.2f}x", f"Based on {request.employee_count} employees"],
-            ["Claims Factor", f"{claims_factor:.2f}x", f"Based on {len(request.claims_history)} claims"],
-            ["Years Factor", f"{years_factor:.2f}x", f"Based on {request.years_in_business} years in business"],
-            ["Final Premium", f"${premium:,.2f}", f"${base_rate:,.2f} × {revenue_factor:.2f} × {employee_factor:.2f} × {claims_factor:.2f} × {years_factor:.2f}"]
-        ]
-        
-        calc_table = Table(calc_data, colWidths=[2*inch, 1.5*inch, 2.5*inch])
-        calc_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ]))
-        story.append(calc_table)
-        story.append(Spacer(1, 12))
-        
-        # Risk Assessment
-        story.append(Paragraph("Risk Assessment", heading_style))
-        story.append(Spacer(1, 6))
-        
-        risk_profile = analysis.get('risk_profile', 'unknown').upper()
-        story.append(Paragraph(f"Risk Profile: {risk_profile}", risk_style))
-        story.append(Spacer(1, 6))
-        
-        # Risk Score
-        if 'risk_score' in analysis:
-            story.append(Paragraph(f"Risk Score: {analysis['risk_score']:.2f}", normal_style))
-            story.append(Spacer(1, 6))
-        
-        # Risk Factors
-        story.append(Paragraph("Risk Factors:", heading_style))
-        story.append(Spacer(1, 6))
-        
-        for factor in analysis.get('risk_factors', []):
-            story.append(Paragraph(f"• {factor}", normal_style))
-        story.append(Spacer(1, 12))
-        
-        # Business Description
-        story.append(Paragraph("Business Description", heading_style))
-        story.append(Spacer(1, 6))
-        story.append(Paragraph(request.business_description, normal_style))
-        story.append(Spacer(1, 12))
-        
-        # Claims History
-        if request.claims_history:
-            story.append(Paragraph("Claims History", heading_style))
-            story.append(Spacer(1, 6))
-            
-            claims_data = [["Date", "Type", "Amount"]]
-            for claim in request.claims_history:
-                claims_data.append([
-                    claim.get('date', 'N/A'),
-                    claim.get('type', 'N/A'),
-                    f"${claim.get('amount', 0):,.2f}"
-                ])
-            
-            claims_table = Table(claims_data, colWidths=[2*inch, 2*inch, 2*inch])
-            claims_table.setStyle(TableStyle([
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ]))
-            story.append(claims_table)
-            story.append(Spacer(1, 12))
-        
-        # Required Conditions
+        # Reuse the caller's premium factors when it already has them
+        factors = factors or self._premium_factors(request)
         conditions = self._determine_conditions(request, analysis)
-        if conditions:
-            story.append(Paragraph("Required Conditions", heading_style))
-            story.append(Spacer(1, 6))
-            
-            for condition in conditions:
-                story.append(Paragraph(f"• {condition}", normal_style))
-            story.append(Spacer(1, 12))
         
-        # Additional Notes
-        if request.additional_notes:
-            story.append(Paragraph("Additional Notes", heading_style))
-            story.append(Spacer(1, 6))
-            story.append(Paragraph(request.additional_notes, normal_style))
-        
-        # Build the PDF
-        doc.build(story)
+        return report_path, (request, analysis, premium, factors, conditions, generated_at)
+    
+    def _generate_report(self, request: PolicyRequest, analysis: Dict, premium: float,
+                         factors: Optional[Dict[str, float]] = None,
+                         generated_at: Optional[datetime] = None,
+                         report_id: Optional[str] = None) -> str:
+        """Generate a detailed PDF report."""
+        report_path, render_args = self._report_args(
+            request, analysis, premium, factors, generated_at, report_id
+        )
+        with open(report_path, "wb") as f:
+            f.write(_render_pdf(*render_args))
+        return report_path
+    
+    async def _generate_report_async(self, request: PolicyRequest, analysis: Dict, premium: float,
+                                     factors: Optional[Dict[str, float]] = None,
+                                     generated_at: Optional[datetime] = None,
+                                     report_id: Optional[str] = None) -> str:
+        """Generate a detailed PDF report in the PDF worker pool."""
+        report_path, render_args = self._report_args(
+            request, analysis, premium, factors, generated_at, report_id
+        )
+        loop = asyncio.get_running_loop()
+        pdf = await loop.run_in_executor(_pdf_pool(), _render_pdf, *render_args)
         
+        # Write the rendered bytes without blocking the event loop
+        async with aiofiles.open(report_path, "wb") as f:
+            await f.write(pdf)
         return report_path
 
     def _determine_conditions(self, request: PolicyRequest, risk_evaluation: Dict[str, Any]) -> List[str]:
         """Determine special conditions based on risk evaluation."""
-        conditions = []
-        
-        # High risk conditions
-        if risk_evaluation['risk_profile'].lower() == 'high':
-            conditions.extend([
-                "Monthly safety inspections required",
-                "Employee training program implementation",
-                "Security system installation",
-                "Regular risk assessment reviews"
-            ])
-        
-        # Business type specific conditions
-        if request.business_type.lower() == 'restaurant':
-            conditions.extend([
-                "Food safety certification required",
-                "Regular kitchen equipment maintenance",
-                "Employee hygiene training"
-            ])
-        elif request.business_type.lower() == 'manufacturing':
-            conditions.extend([
-                "Equipment safety inspections",
-                "Worker safety training",
-                "Emergency response plan"
-            ])
-        
-        # Claims history conditions
-        if request.claims_history:
-            conditions.extend([
-                "Claims review every 6 months",
-                "Risk mitigation plan required"
-            ])
-        
-        return conditions
+        # risk_profile is constrained to lowercase values by the tool schema
+        return [
+            *(_HIGH_RISK_CONDITIONS if risk_evaluation['risk_profile'] == 'high' else ()),
+            *_BUSINESS_TYPE_CONDITIONS.get(request.business_type, ()),
+            *(_CLAIMS_CONDITIONS if request.claims_history else ())
+        ]
 
-    def _generate_explanation(self, request: PolicyRequest, risk_evaluation: Dict[str, Any], premium: float) -> str:
+    def _generate_explanation(self, request: PolicyRequest, risk_evaluation: Dict[str, Any], premium: float,
+                              factors: Optional[Dict[str, float]] = None) -> str:
         """Generate a detailed explanation of the premium calculation."""
-        base_rate = self._calculate_base_rate(request.business_type)
-        revenue_factor = self._calculate_revenue_factor(request.annual_revenue)
-        employee_factor = self._calculate_employee_factor(request.employee_count)
-        claims_factor = self._calculate_claims_factor(request.claims_history)
-        years_factor = self._calculate_years_factor(request.years_in_business)
+        factors = factors or self._premium_factors(request)
+        base_rate = factors['base_rate']
+        revenue_factor = factors['revenue_factor']
+        employee_factor = factors['employee_factor']
+        claims_factor = factors['claims_factor']
+        years_factor = factors['years_factor']
         
         explanation = [
             f"Premium calculation for {request.business_name}:",
@@ -562,13 +684,194 @@ class UnderwritingAgent:
         
         return "\n".join(explanation)
 
+def _render_pdf(request: PolicyRequest, analysis: Dict, premium: float,
+                factors: Dict[str, float], conditions: List[str],
+                generated_at: datetime) -> bytes:
+    """Render a quote report PDF and return its bytes.
+    
+    Kept at module level, with all inputs precomputed, so it can be pickled
+    and run in the PDF worker pool.
+    """
+    # Create the PDF document in memory
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=letter,
+        rightMargin=72,
+        leftMargin=72,
+        topMargin=72,
+        bottomMargin=72
+    )
+    
+    # Get styles
+    title_style = _TITLE_STYLE
+    heading_style = _HEADING_STYLE
+    normal_style = _NORMAL_STYLE
+    risk_style = _RISK_STYLES.get(analysis.get('risk_profile', 'low'), _RISK_STYLES['low'])
+    
+    # Build the document
+    story = []
+    
+    # Title
+    story.append(Paragraph(f"Insurance Quote Report for {request.business_name}", title_style))
+    story.append(Spacer(1, 12))
+    
+    # Quote Details
+    story.append(Paragraph("Quote Details", heading_style))
+    story.append(Spacer(1, 6))
+    
+    quote_data = [
+        ["Business Name:", request.business_name],
+        ["Business Type:", request.business_type],
+        ["Annual Revenue:", f"${request.annual_revenue:,.2f}"],
+        ["Employee Count:", str(request.employee_count)],
+        ["Location:", f"{request.city}, {request.state}"],
+        ["Years in Business:", str(request.years_in_business)],
+        ["Premium Estimate:", f"${premium:,.2f}"],
+        ["Risk Profile:", analysis.get('risk_profile', 'unknown')],
+        ["Generated On:", generated_at.strftime("%Y-%m-%d %H:%M:%S")]
+    ]
+    
+    quote_table = Table(quote_data, colWidths=[2*inch, 4*inch])
+    quote_table.setStyle(_TABLE_STYLE_HEADER)
+    story.append(quote_table)
+    story.append(Spacer(1, 12))
+    
+    # Premium Calculation Breakdown
+    story.append(Paragraph("Premium Calculation Breakdown", heading_style))
+    story.append(Spacer(1, 6))
+    
+    # Premium factors
+    base_rate = factors['base_rate']
+    revenue_factor = factors['revenue_factor']
+    employee_factor = factors['employee_factor']
+    claims_factor = factors['claims_factor']
+    years_factor = factors['years_factor']
+    
+    # Create calculation table
+    calc_data = [
+        ["Factor", "Value", "Explanation"],
+        ["Base Rate", f"${base_rate:,.2f}", f"Standard rate for {request.business_type.title()} businesses"],
+        ["Revenue Factor", f"{revenue_factor:.2f}x", f"Based on annual revenue of ${request.annual_revenue:,.2f}"],
+        ["Employee Factor", f"{employee_factor:.2f}x", f"Based on {request.employee_count} employees"],
+        ["Claims Factor", f"{claims_factor:.2f}x", f"Based on {len(request.claims_history)} claims"],
+        ["Years Factor", f"{years_factor:.2f}x", f"Based on {request.years_in_business} years in business"],
+        ["Final Premium", f"${premium:,.2f}", f"${base_rate:,.2f} × {revenue_factor:.2f} × {employee_factor:.2f} × {claims_factor:.2f} × {years_factor:.2f}"]
+    ]
+    
+    calc_table = Table(calc_data, colWidths=[2*inch, 1.5*inch, 2.5*inch])
+    calc_table.setStyle(_TABLE_STYLE_HEADER)
+    story.append(calc_table)
+    story.append(Spacer(1, 12))
+    
+    # Risk Assessment
+    story.append(Paragraph("Risk Assessment", heading_style))
+    story.append(Spacer(1, 6))
+    
+    risk_profile = analysis.get('risk_profile', 'unknown').upper()
+    story.append(Paragraph(f"Risk Profile: {risk_profile}", risk_style))
+    story.append(Spacer(1, 6))
+    
+    # Risk Score
+    if 'risk_score' in analysis:
+        story.append(Paragraph(f"Risk Score: {analysis['risk_score']:.2f}", normal_style))
+        story.append(Spacer(1, 6))
+    
+    # Risk Factors
+    story.append(Paragraph("Risk Factors:", heading_style))
+    story.append(Spacer(1, 6))
+    
+    # One multi-line paragraph per list keeps the flowable count down
+    risk_factors = analysis.get('risk_factors', [])
+    if risk_factors:
+        story.append(Paragraph("<br/>".join(f"• {factor}" for factor in risk_factors), normal_style))
+    story.append(Spacer(1, 12))
+    
+    # Business Description
+    story.append(Paragraph("Business Description", heading_style))
+    story.append(Spacer(1, 6))
+    story.append(Paragraph(request.business_description, normal_style))
+    story.append(Spacer(1, 12))
+    
+    # Claims History
+    if request.claims_history:
+        story.append(Paragraph("Claims History", heading_style))
+        story.append(Spacer(1, 6))
+    
+        claims_data = [["Date", "Type", "Amount"]]
+        for claim in request.claims_history:
+            claims_data.append([
+                claim.date,
+                claim.type,
+                f"${claim.amount:,.2f}"
+            ])
+    
+        claims_table = Table(claims_data, colWidths=[2*inch, 2*inch, 2*inch])
+        claims_table.setStyle(_TABLE_STYLE_HEADER)
+        story.append(claims_table)
+        story.append(Spacer(1, 12))
+    
+    # Required Conditions
+    if conditions:
+        story.append(Paragraph("Required Conditions", heading_style))
+        story.append(Spacer(1, 6))
+    
+        story.append(Paragraph("<br/>".join(f"• {condition}" for condition in conditions), normal_style))
+        story.append(Spacer(1, 12))
+    
+    # Additional Notes
+    if request.additional_notes:
+        story.append(Paragraph("Additional Notes", heading_style))
+        story.append(Spacer(1, 6))
+        story.append(Paragraph(request.additional_notes, normal_style))
+    
+    # Build the PDF
+    doc.build(story)
+    
+    return buffer.getvalue()
+
+@lru_cache(maxsize=1)
+def get_agent() -> UnderwritingAgent:
+    """Get the API's agent, created on first request so imports need no API key."""
+    return UnderwritingAgent()
+
+@lru_cache(maxsize=1)
+def get_batcher() -> QuoteBatcher:
+    """Get the batcher for non-interactive requests routed through the Message Batches API."""
+    return QuoteBatcher(get_agent())
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Release shared batching, HTTP and PDF resources on shutdown."""
+    yield
+    if get_batcher.cache_info().currsize:
+        await get_batcher().close()
+    await _close_http_client()
+    _shutdown_pdf_pool()
+
 # Create FastAPI app
-app = FastAPI(title="Auto UW API")
+app = FastAPI(title="Auto UW API", lifespan=lifespan)
 
-# Initialize agent
-agent = UnderwritingAgent()
+# Validator for bulk request bodies
+_POLICY_REQUESTS = TypeAdapter(List[PolicyRequest])
 
 @app.post("/quote")
-async def get_quote(request: PolicyRequest):
+async def get_quote(request: PolicyRequest, batch: bool = False):
     """Get an insurance quote for a business"""
-    return agent.process_policy_request(request)
\ No newline at end of file
+    if batch:
+        return await get_batcher().submit(request)
+    return await get_agent().process_policy_request(request)
+
+@app.post("/quote/batch")
+async def get_batch_quotes(body: List[Dict[str, Any]] = Body(...)):
+    """Get insurance quotes for several businesses at batch pricing"""
+    # Validate the whole body in one pass
+    try:
+        requests = _POLICY_REQUESTS.validate_python(body)
+    except ValidationError as e:
+        # Report errors the way FastAPI does for declared body models
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
+        )
+    batcher = get_batcher()
+    return await asyncio.gather(*(batcher.submit(request) for request in requests))
\ No newline at end of file
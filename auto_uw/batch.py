@@ -0,0 +1,138 @@
+"""
+Batch processing of policy requests through Anthropic's Message Batches API.
+"""
+
+import asyncio
+import uuid
+from typing import Any, Dict, List, Optional, Set, Tuple
+from .models import PolicyRequest
+
+# SDK retries for batch create/retrieve/results calls; the agent's shared
+# client disables them because interactive calls retry in _create_message
+BATCH_MAX_RETRIES = 2
+
+def _fail(items: List[Tuple[str, PolicyRequest, asyncio.Future]], error: BaseException) -> None:
+    """Fail every unresolved future in a group of queued requests."""
+    for _, _, future in items:
+        if not future.done():
+            future.set_exception(error)
+
+class QuoteBatcher:
+    """Collects policy requests and prices them through the Message Batches API.
+
+    Requests submitted within ``max_wait_ms`` of each other are sent to
+    Anthropic as a single batch of at most ``max_batch_size`` requests, which
+    is billed at a discount. Batches complete asynchronously, so this path
+    suits bulk and backfill workloads rather than interactive quoting.
+    """
+
+    def __init__(self, agent: Any, max_batch_size: int = 100,
+                 max_wait_ms: int = 500, poll_interval: float = 5.0):
+        """Initialize the batcher for an underwriting agent."""
+        self.agent = agent
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.poll_interval = poll_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._batches: Set[asyncio.Task] = set()
+
+    async def submit(self, request: PolicyRequest) -> Dict[str, Any]:
+        """Queue a policy request and wait for its quote."""
+        # Create the queue and worker lazily so they bind to the running loop
+        if (self._worker is None or self._worker.done()
+                or self._worker.get_loop() is not asyncio.get_running_loop()):
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.ensure_future(self._collect())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((str(uuid.uuid4()), request, future))
+        return await future
+
+    async def close(self, timeout: float = 5.0) -> None:
+        """Stop collecting requests and shut down in-flight batches.
+
+        Batches can take hours to end, so they get ``timeout`` seconds to
+        finish; the rest are cancelled and their requests fail.
+        """
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+        if self._queue is not None:
+            while not self._queue.empty():
+                _fail([self._queue.get_nowait()], RuntimeError("QuoteBatcher closed"))
+        if self._batches:
+            _, pending = await asyncio.wait(self._batches, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _collect(self) -> None:
+        """Group queued requests into batches by size and wait window."""
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait_ms / 1000
+            while len(items) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+                except asyncio.CancelledError:
+                    _fail(items, RuntimeError("QuoteBatcher closed"))
+                    raise
+
+            # Process each batch in the background so new requests keep collecting
+            task = asyncio.ensure_future(self._process_batch(items))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _process_batch(self, items: List[Tuple[str, PolicyRequest, asyncio.Future]]) -> None:
+        """Submit one batch and resolve each request's future with its quote."""
+        try:
+            results = await self._run_batch([
+                {"custom_id": quote_id, "params": self.agent._analysis_params(request)}
+                for quote_id, request, _ in items
+            ])
+
+            # Price and render every result concurrently
+            await asyncio.gather(*(
+                self._resolve(future, quote_id, request, results.get(quote_id))
+                for quote_id, request, future in items
+                if not future.done()
+            ))
+        except asyncio.CancelledError:
+            _fail(items, RuntimeError("QuoteBatcher closed before the batch ended"))
+            raise
+        except Exception as e:
+            _fail(items, e)
+
+    async def _resolve(self, future: asyncio.Future, quote_id: str,
+                       request: PolicyRequest, result: Any) -> None:
+        """Build the quote for one batch result and resolve its future."""
+        if result is None or result.type != "succeeded":
+            status = result.type if result is not None else "missing"
+            future.set_exception(ValueError(f"Batch request {quote_id} failed: {status}"))
+            return
+        try:
+            analysis = self.agent._parse_claude_response(result.message)
+            future.set_result(await self.agent._build_quote(quote_id, request, analysis))
+        except Exception as e:
+            future.set_exception(e)
+
+    async def _run_batch(self, requests: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Create a message batch, poll until it ends and return results by custom_id."""
+        batches = self.agent.client.with_options(max_retries=BATCH_MAX_RETRIES).messages.batches
+        batch = await batches.create(requests=requests)
+        while batch.processing_status != "ended":
+            await asyncio.sleep(self.poll_interval)
+            batch = await batches.retrieve(batch.id)
+
+        results = {}
+        async for entry in await batches.results(batch.id):
+            results[entry.custom_id] = entry.result
+        return results
@@ -0,0 +1,102 @@
+"""
+Cache of Claude's policy analyses, keyed by the request sent to the API.
+"""
+
+import os
+import time
+import uuid
+from collections import OrderedDict
+from hashlib import blake2b
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+import aiofiles
+import aiofiles.os
+import orjson
+from .fs import ensure_dir
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "auto_uw", "analyses")
+
+# Bump when cached analyses are parsed or used differently, to invalidate old entries
+CACHE_VERSION = 1
+# Seconds an analysis stays valid; underwriting guidance changes over time
+DEFAULT_TTL = 7 * 24 * 60 * 60
+# Analyses kept in memory, so long-running servers don't grow without bound
+DEFAULT_MAX_ENTRIES = 1024
+
+class AnalysisCache:
+    """In-memory and on-disk cache of parsed policy analyses.
+
+    Entries are keyed by a digest of the cache version and the full
+    messages.create arguments, so a change to the model, prompts or tool
+    schema misses the cache, and expire after ``ttl`` seconds. Only the
+    analysis is cached: every hit still gets a fresh quote ID and report.
+    """
+
+    def __init__(self, cache_dir: Union[str, os.PathLike] = DEFAULT_CACHE_DIR,
+                 ttl: Optional[float] = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """Initialize the cache in a directory, created on first write."""
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # Creation time and analysis by key, least recently used first
+        self._memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    @staticmethod
+    def key(params: Dict[str, Any]) -> str:
+        """Get the cache key for a set of messages.create arguments."""
+        payload = orjson.dumps([CACHE_VERSION, params], option=orjson.OPT_SORT_KEYS)
+        return blake2b(payload, digest_size=16).hexdigest()
+
+    def _expired(self, created_at: float) -> bool:
+        """Check whether an entry created at a given time has expired."""
+        return self.ttl is not None and time.time() - created_at > self.ttl
+
+    def _remember(self, key: str, created_at: float, analysis: Dict[str, Any]) -> None:
+        """Keep an entry in memory, evicting the least recently used past max_entries."""
+        self._memory[key] = (created_at, analysis)
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a cached analysis, or None on a miss."""
+        entry = self._memory.get(key)
+        if entry is None:
+            try:
+                async with aiofiles.open(self.cache_dir / f"{key}.json", "rb") as f:
+                    data = orjson.loads(await f.read())
+                entry = (data["created_at"], data["analysis"])
+            except (OSError, orjson.JSONDecodeError, KeyError, TypeError):
+                # Missing, unreadable or malformed entries are misses
+                return None
+
+        created_at, analysis = entry
+        if self._expired(created_at):
+            self._memory.pop(key, None)
+            return None
+        self._remember(key, created_at, analysis)
+        return analysis
+
+    async def set(self, key: str, analysis: Dict[str, Any]) -> None:
+        """Store an analysis in memory and on disk.
+
+        The file is written under a temporary name and renamed into place,
+        so concurrent readers never see a partial entry. Disk errors are
+        reported and otherwise ignored: the analysis has already been paid
+        for, so it is still kept in memory for this process.
+        """
+        created_at = time.time()
+        path = self.cache_dir / f"{key}.json"
+        tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            ensure_dir(self.cache_dir)
+            async with aiofiles.open(tmp_path, "wb") as f:
+                await f.write(orjson.dumps({"created_at": created_at, "analysis": analysis}))
+            await aiofiles.os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing cache entry {path}: {e}")
+            try:
+                await aiofiles.os.remove(tmp_path)
+            except OSError:
+                pass
+        self._remember(key, created_at, analysis)
@@ -2,15 +2,136 @@
 Claude-specific implementation of the ModelContext protocol.
 """
 
+import os
 from typing import Dict, Any, Optional
+from collections import OrderedDict
+from hashlib import blake2b
+from anthropic import Anthropic, AnthropicError
 from .model_context import ModelContext
 import json
 
+# Number of distinct texts whose token counts are remembered
+TOKEN_COUNT_CACHE_SIZE = 1024
+
+# Static prompt prefixes shared by every underwriting call. These must stay
+# byte-identical across requests so Anthropic's prompt cache can match them.
+EPHEMERAL_CACHE_CONTROL = {"type": "ephemeral"}
+
+RISK_EVALUATION_SYSTEM_PROMPT = (
+    "You are an expert insurance underwriter. Evaluate the business risk profile. "
+    "Always report your evaluation with the provided tool."
+)
+
+POLICY_ANALYSIS_SYSTEM_PROMPT = (
+    "You are an expert insurance underwriter. Analyze the business details and "
+    "provide a risk assessment and premium estimate. Always report your analysis "
+    "with the provided tool."
+)
+
+RISK_EVALUATION_INSTRUCTIONS = """
+Evaluate the risk profile for the business described below.
+
+Report your evaluation with the report_risk tool, providing:
+1. risk_profile (low/medium/high)
+2. risk_factors (list of specific factors)
+3. risk_score (0-100)
+"""
+
+POLICY_ANALYSIS_INSTRUCTIONS = """
+Please analyze the business described below for insurance underwriting.
+
+Report your analysis with the report_policy_analysis tool, providing:
+1. risk_profile (low/medium/high)
+2. risk_factors (list of specific factors)
+3. recommendations (list of risk mitigation steps)
+"""
+
+POLICY_BATCH_ANALYSIS_INSTRUCTIONS = """
+Please analyze each business described below for insurance underwriting. Each
+business is wrapped in a <request id="..."> tag; analyze them independently.
+
+Report all analyses in one call to the report_policy_analyses tool, with one
+entry per request providing:
+1. request_id (the id attribute of the request's tag)
+2. risk_profile (low/medium/high)
+3. risk_factors (list of specific factors)
+4. recommendations (list of risk mitigation steps)
+"""
+
+# Tools Claude is forced to call, so responses arrive as schema-checked JSON
+_RISK_PROFILE_SCHEMA = {"type": "string", "enum": ["low", "medium", "high"]}
+_STRING_LIST_SCHEMA = {"type": "array", "items": {"type": "string"}}
+
+RISK_EVALUATION_TOOL = {
+    "name": "report_risk",
+    "description": "Report the underwriting risk evaluation for a business.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "risk_profile": _RISK_PROFILE_SCHEMA,
+            "risk_factors": _STRING_LIST_SCHEMA,
+            "risk_score": {"type": "number", "minimum": 0, "maximum": 100}
+        },
+        "required": ["risk_profile", "risk_factors", "risk_score"]
+    }
+}
+
+POLICY_ANALYSIS_TOOL = {
+    "name": "report_policy_analysis",
+    "description": "Report the underwriting analysis for a business.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "risk_profile": _RISK_PROFILE_SCHEMA,
+            "risk_factors": _STRING_LIST_SCHEMA,
+            "recommendations": _STRING_LIST_SCHEMA
+        },
+        "required": ["risk_profile", "risk_factors", "recommendations"]
+    }
+}
+
+
+POLICY_BATCH_ANALYSIS_TOOL = {
+    "name": "report_policy_analyses",
+    "description": "Report the underwriting analyses for several businesses.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "analyses": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "request_id": {"type": "string"},
+                        **POLICY_ANALYSIS_TOOL["input_schema"]["properties"]
+                    },
+                    "required": ["request_id", *POLICY_ANALYSIS_TOOL["input_schema"]["required"]]
+                }
+            }
+        },
+        "required": ["analyses"]
+    }
+}
+
+
+def forced_tool_choice(tool: Dict[str, Any]) -> Dict[str, Any]:
+    """Build a tool_choice that requires Claude to call the given tool."""
+    return {"type": "tool", "name": tool["name"]}
+
+
+def cached_text_block(text: str) -> Dict[str, Any]:
+    """Wrap static prompt text in a content block marked for prompt caching."""
+    return {"type": "text", "text": text, "cache_control": EPHEMERAL_CACHE_CONTROL}
+
 class ClaudeContext(ModelContext):
     """Implementation of ModelContext for Claude model."""
     
-    def __init__(self, model: str = "claude-3-sonnet-20240229"):
+    def __init__(self, model: str = "claude-3-sonnet-20240229",
+                 client: Optional[Anthropic] = None):
         self.model = model
+        self._client = client
+        # Token counts keyed by text digest so prompts are not kept in memory
+        self._token_counts: "OrderedDict[bytes, int]" = OrderedDict()
         self._system_prompt = """
         You are an expert insurance underwriter for small business policies. Your task is to:
         
@@ -34,17 +155,16 @@ class ClaudeContext(ModelContext):
     def parse_model_response(self, response: Any) -> Dict[str, Any]:
         """Parse Claude's response into a structured format."""
         try:
-            # Extract the text content from Claude's response
-            content = response.content[0].text
+            # Structured output arrives as the input of a tool_use block
+            for block in response.content:
+                if block.type == "tool_use":
+                    return {"parsed": True, "data": block.input}
             
-            # Try to find and parse JSON in the response
-            start_idx = content.find("{")
-            end_idx = content.rfind("}") + 1
-            if start_idx >= 0 and end_idx > start_idx:
-                json_str = content[start_idx:end_idx]
-                return {"parsed": True, "data": json.loads(json_str)}
-            else:
-                return {"parsed": False, "raw_content": content}
+            # Calls made without tools only carry text
+            content = "".join(
+                block.text for block in response.content if block.type == "text"
+            )
+            return {"parsed": False, "raw_content": content}
         except Exception as e:
             return self.handle_error(e)
     
@@ -75,6 +195,28 @@ class ClaudeContext(ModelContext):
         return 200000
     
     def get_token_count(self, text: str) -> int:
-        """Estimate the token count for a given text."""
-        # Rough estimation: 1 token ≈ 4 characters for English text
-        return len(text) // 4 
\ No newline at end of file
+        """Count the tokens in a given text with Anthropic's token counter."""
+        key = blake2b(text.encode("utf-8"), digest_size=16).digest()
+        if key in self._token_counts:
+            self._token_counts.move_to_end(key)
+            return self._token_counts[key]
+        
+        # Rough estimation when the API is unavailable or no credentials are
+        # configured: 1 token ≈ 4 characters. Estimates are remembered too, so
+        # an unreachable API isn't retried for the same text.
+        count = len(text) // 4
+        if self._client is not None or os.getenv("ANTHROPIC_API_KEY"):
+            try:
+                if self._client is None:
+                    self._client = Anthropic()
+                count = self._client.messages.count_tokens(
+                    model=self.model,
+                    messages=[{"role": "user", "content": text}]
+                ).input_tokens
+            except (AnthropicError, TypeError):
+                pass
+        
+        self._token_counts[key] = count
+        if len(self._token_counts) > TOKEN_COUNT_CACHE_SIZE:
+            self._token_counts.popitem(last=False)
+        return count 
\ No newline at end of file
@@ -2,17 +2,21 @@
 Command-line interface for the Auto UW package.
 """
 
+import asyncio
+import errno
 import json
+import mmap
 import os
-from typing import Dict, Any
+import sys
+import orjson
+from typing import Dict, Any, List, Optional, Tuple, Union
 from pathlib import Path
 import click
 from dotenv import load_dotenv
-from .agent import UnderwritingAgent
+from .agent import MAX_REQUESTS_PER_PROMPT, UnderwritingAgent
+from .fs import ensure_dir
 from .models import PolicyRequest, Claim
-
-# Load environment variables
-load_dotenv()
+from .rate_limiter import AsyncRateLimiter
 
 def validate_api_key() -> None:
     """Validate that the Anthropic API key is set."""
@@ -22,30 +26,110 @@ def validate_api_key() -> None:
             "Please set it before running the command."
         )
 
-def load_json_file(file_path: str) -> Dict[str, Any]:
+def load_json_file(file_path: Union[str, Path]) -> Dict[str, Any]:
     """Load and validate a JSON file."""
     try:
-        with open(file_path, 'r') as f:
-            data = json.load(f)
-        return data
-    except json.JSONDecodeError as e:
+        return orjson.loads(Path(file_path).read_bytes())
+    except orjson.JSONDecodeError as e:
         raise click.ClickException(f"Invalid JSON file: {e}")
     except FileNotFoundError:
         raise click.ClickException(f"File not found: {file_path}")
 
-def save_json_file(data: Dict[str, Any], file_path: str) -> None:
+def save_json_file(data: Dict[str, Any], file_path: Union[str, Path]) -> None:
     """Save data to a JSON file."""
     try:
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=2)
+        file_path = Path(file_path)
+        ensure_dir(file_path.parent)
+        file_path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
     except Exception as e:
         raise click.ClickException(f"Failed to save output file: {e}")
 
+# Alignment for O_DIRECT buffers, offsets and lengths; covers common block sizes
+_DIRECT_IO_ALIGNMENT = 4096
+
+def write_direct(file_path: Path, payload: bytes) -> None:
+    """Write a file with O_DIRECT so it bypasses the page cache.
+    
+    Falls back to a buffered write where O_DIRECT is unavailable or the
+    filesystem rejects it (e.g. tmpfs).
+    """
+    if not hasattr(os, 'O_DIRECT'):
+        file_path.write_bytes(payload)
+        return
+    
+    # Anonymous mmaps are page aligned, which satisfies O_DIRECT's buffer alignment
+    size = -(-len(payload) // _DIRECT_IO_ALIGNMENT) * _DIRECT_IO_ALIGNMENT or _DIRECT_IO_ALIGNMENT
+    try:
+        fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_DIRECT, 0o644)
+    except OSError as e:
+        if e.errno != errno.EINVAL:
+            raise
+        file_path.write_bytes(payload)
+        return
+    
+    try:
+        with mmap.mmap(-1, size) as buffer, memoryview(buffer) as view:
+            buffer[:len(payload)] = payload
+            # os.write may write less than asked, so write until the buffer is done
+            written = 0
+            while written < size:
+                with view[written:] as remaining:
+                    written += os.write(fd, remaining)
+        # Drop the padding written to reach the aligned length
+        os.ftruncate(fd, len(payload))
+        return
+    except OSError as e:
+        if e.errno != errno.EINVAL:
+            raise
+    finally:
+        os.close(fd)
+    file_path.write_bytes(payload)
+
+class BatchJsonWriter:
+    """Buffers JSON outputs and writes them in batches from a worker thread.
+
+    The output directory must already exist; batching skips the per-file
+    directory check and hands each batch to the thread pool in one hop. With
+    ``direct_io``, files are written with O_DIRECT so write-once quotes don't
+    fill the page cache.
+    """
+
+    def __init__(self, max_batch: int = 64, direct_io: bool = False):
+        """Initialize the writer with the number of files written per batch."""
+        self.max_batch = max_batch
+        self.direct_io = direct_io
+        self._pending: List[Tuple[Path, bytes]] = []
+
+    async def add(self, data: Dict[str, Any], file_path: Path) -> None:
+        """Queue data for a JSON file, writing the batch once it is full."""
+        self._pending.append((file_path, orjson.dumps(data, option=orjson.OPT_INDENT_2)))
+        if len(self._pending) >= self.max_batch:
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write every queued file."""
+        batch, self._pending = self._pending, []
+        if batch:
+            await asyncio.to_thread(self._write, batch)
+
+    def _write(self, batch: List[Tuple[Path, bytes]]) -> None:
+        """Write a batch of serialized outputs."""
+        for file_path, payload in batch:
+            try:
+                if self.direct_io:
+                    write_direct(file_path, payload)
+                else:
+                    file_path.write_bytes(payload)
+            except OSError as e:
+                click.echo(f"Failed to save {file_path}: {e}", err=True)
+                continue
+            click.echo(f"Quote saved to {file_path}")
+
 @click.group()
 def cli():
     """Auto UW - Automated Insurance Underwriting System."""
-    pass
+    # Load environment variables when a command runs, not when the module is imported
+    load_dotenv()
 
 @cli.command()
 @click.option('--business-name', required=True, help='Name of the business')
@@ -56,11 +140,16 @@ def cli():
 @click.option('--city', required=True, help='City where the business operates')
 @click.option('--years-in-business', required=True, type=int, help='Years in business')
 @click.option('--business-description', required=True, help='Detailed description of business operations')
-@click.option('--claims', help='JSON file containing claims history')
-@click.option('--output', '-o', help='Output file path for the quote')
+@click.option('--claims', type=click.Path(exists=True, dir_okay=False, path_type=Path),
+              help='JSON file containing claims history')
+@click.option('--output', '-o', type=click.Path(dir_okay=False, path_type=Path),
+              help='Output file path for the quote')
+@click.option('--cache/--no-cache', default=True, show_default=True,
+              help="Reuse Claude's analysis for identical requests")
 def quote(business_name: str, business_type: str, annual_revenue: float,
           employee_count: int, state: str, city: str, years_in_business: int,
-          business_description: str, claims: str, output: str) -> None:
+          business_description: str, claims: Optional[Path], output: Optional[Path],
+          cache: bool) -> None:
     """Generate an insurance quote for a business."""
     try:
         # Validate API key
@@ -72,7 +161,7 @@ def quote(business_name: str, business_type: str, annual_revenue: float,
             claims_data = load_json_file(claims)
             if not isinstance(claims_data, list):
                 raise click.ClickException("Claims file must contain a list of claims")
-            claims_history = [Claim(**claim) for claim in claims_data]
+            claims_history = Claim.from_list(claims_data)
         
         # Create policy request
         request = PolicyRequest(
@@ -88,8 +177,8 @@ def quote(business_name: str, business_type: str, annual_revenue: float,
         )
         
         # Initialize agent and process request
-        agent = UnderwritingAgent()
-        result = agent.process_request(request)
+        agent = UnderwritingAgent({'cache': cache})
+        result = asyncio.run(agent.process_policy_request(request))
         
         # Save or display result
         if output:
@@ -101,10 +190,95 @@ def quote(business_name: str, business_type: str, annual_revenue: float,
     except Exception as e:
         raise click.ClickException(str(e))
 
+async def _process_batch(agent: UnderwritingAgent, data: List[Dict[str, Any]],
+                         output_dir: Optional[Path], concurrency: int,
+                         rps: Optional[float], direct_io: bool = False,
+                         group_size: int = 1) -> None:
+    """Quote every request concurrently, bounded by concurrency and request rate.
+
+    With a group size above one, up to that many requests share each Claude
+    call through the agent's process_request_batch.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = AsyncRateLimiter(rps) if rps else None
+    writer = BatchJsonWriter(direct_io=direct_io)
+
+    async def save(i: int, request: PolicyRequest, result: Dict[str, Any]) -> None:
+        if output_dir:
+            output_file = output_dir / f"quote_{request.business_name.lower().replace(' ', '_')}_{i}.json"
+            await writer.add(result, output_file)
+        else:
+            click.echo(f"\nQuote {i} for {request.business_name}:")
+            click.echo(json.dumps(result, indent=2))
+
+    async def process(i: int, request_data: Dict[str, Any]) -> None:
+        try:
+            # Create policy request
+            request = PolicyRequest(**request_data)
+
+            # Process request
+            async with semaphore:
+                if limiter is not None:
+                    await limiter.acquire()
+                result = await agent.process_policy_request(request)
+
+            # Save result
+            await save(i, request, result)
+
+        except Exception as e:
+            click.echo(f"Error processing request {i}: {str(e)}", err=True)
+
+    async def process_group(group: List[Tuple[int, PolicyRequest]]) -> None:
+        try:
+            async with semaphore:
+                if limiter is not None:
+                    await limiter.acquire()
+                results = await agent.process_request_batch(
+                    [request for _, request in group], k=group_size
+                )
+        except Exception as e:
+            for i, _ in group:
+                click.echo(f"Error processing request {i}: {str(e)}", err=True)
+            return
+
+        for (i, request), result in zip(group, results):
+            await save(i, request, result)
+
+    if group_size == 1:
+        await asyncio.gather(*(process(i, request_data) for i, request_data in enumerate(data, 1)))
+    else:
+        requests = []
+        for i, request_data in enumerate(data, 1):
+            try:
+                requests.append((i, PolicyRequest(**request_data)))
+            except Exception as e:
+                click.echo(f"Error processing request {i}: {str(e)}", err=True)
+        groups = [requests[i:i + group_size] for i in range(0, len(requests), group_size)]
+        await asyncio.gather(*(process_group(group) for group in groups))
+    await writer.flush()
+
 @cli.command()
-@click.argument('input_file', type=click.Path(exists=True))
-@click.option('--output-dir', '-o', help='Output directory for quotes')
-def batch_quote(input_file: str, output_dir: str) -> None:
+@click.argument('input_file', type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option('--output-dir', '-o', type=click.Path(file_okay=False, path_type=Path),
+              help='Output directory for quotes')
+@click.option('--concurrency', default=8, show_default=True, type=click.IntRange(min=1),
+              help='Maximum number of requests processed at once')
+@click.option('--rps', type=click.FloatRange(min=0, min_open=True),
+              help='Maximum requests started per second (default: unlimited)')
+@click.option('--rpm', type=click.FloatRange(min=0, min_open=True),
+              help='Maximum Anthropic requests per minute (default: ANTHROPIC_RPM)')
+@click.option('--tpm', type=click.FloatRange(min=0, min_open=True),
+              help='Maximum Anthropic input tokens per minute (default: ANTHROPIC_TPM)')
+@click.option('--direct-io', is_flag=True,
+              help='Write quote files with O_DIRECT to keep them out of the page cache (Linux)')
+@click.option('--cache/--no-cache', default=True, show_default=True,
+              help="Reuse Claude's analysis for identical requests")
+@click.option('--group-size', default=1, show_default=True,
+              type=click.IntRange(min=1, max=MAX_REQUESTS_PER_PROMPT),
+              help='Number of requests analyzed together in each Claude call')
+def batch_quote(input_file: Path, output_dir: Optional[Path], concurrency: int, rps: Optional[float],
+                rpm: Optional[float], tpm: Optional[float], direct_io: bool, cache: bool,
+                group_size: int) -> None:
     """Process multiple policy requests from a JSON file."""
     try:
         # Validate API key
@@ -117,39 +291,65 @@ def batch_quote(input_file: str, output_dir: str) -> None:
         
         # Create output directory if specified
         if output_dir:
-            os.makedirs(output_dir, exist_ok=True)
+            ensure_dir(output_dir)
         
-        # Initialize agent
-        agent = UnderwritingAgent()
+        # Initialize agent, shared by every request
+        agent = UnderwritingAgent({'cache': cache, 'rpm': rpm, 'tpm': tpm})
         
-        # Process each request
-        for i, request_data in enumerate(data, 1):
-            try:
-                # Create policy request
-                request = PolicyRequest(**request_data)
-                
-                # Process request
-                result = agent.process_request(request)
-                
-                # Save result
-                if output_dir:
-                    output_file = os.path.join(
-                        output_dir,
-                        f"quote_{request.business_name.lower().replace(' ', '_')}_{i}.json"
-                    )
-                    save_json_file(result, output_file)
-                    click.echo(f"Quote {i} saved to {output_file}")
-                else:
-                    click.echo(f"\nQuote {i} for {request.business_name}:")
-                    click.echo(json.dumps(result, indent=2))
-                    
-            except Exception as e:
-                click.echo(f"Error processing request {i}: {str(e)}", err=True)
-                continue
+        # Process requests concurrently
+        asyncio.run(_process_batch(agent, data, output_dir, concurrency, rps, direct_io, group_size))
                 
     except Exception as e:
         raise click.ClickException(str(e))
 
+async def _serve(agent: UnderwritingAgent, concurrency: int) -> None:
+    """Quote line-delimited JSON requests from stdin, writing one JSON line per request.
+
+    Requests are processed concurrently, up to concurrency at once, but results
+    are written in input order so each output line matches its input line.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    pending: "asyncio.Queue[Optional[asyncio.Task]]" = asyncio.Queue(maxsize=concurrency)
+
+    async def process(line: bytes) -> bytes:
+        try:
+            request = PolicyRequest(**orjson.loads(line))
+            async with semaphore:
+                result = await agent.process_policy_request(request)
+        except Exception as e:
+            result = {"error": str(e)}
+        return orjson.dumps(result) + b"\n"
+
+    async def read() -> None:
+        while line := await asyncio.to_thread(sys.stdin.buffer.readline):
+            if line.strip():
+                await pending.put(asyncio.create_task(process(line)))
+        await pending.put(None)
+
+    reader = asyncio.create_task(read())
+    while (task := await pending.get()) is not None:
+        sys.stdout.buffer.write(await task)
+        sys.stdout.buffer.flush()
+    await reader
+
+@cli.command()
+@click.option('--concurrency', default=8, show_default=True, type=click.IntRange(min=1),
+              help='Maximum number of requests processed at once')
+@click.option('--cache/--no-cache', default=True, show_default=True,
+              help="Reuse Claude's analysis for identical requests")
+def serve(concurrency: int, cache: bool) -> None:
+    """Quote policy requests read as JSON lines from stdin, reusing one agent."""
+    try:
+        # Validate API key
+        validate_api_key()
+        
+        # Initialize agent once for every request on stdin
+        agent = UnderwritingAgent({'cache': cache})
+        asyncio.run(_serve(agent, concurrency))
+        
+    except Exception as e:
+        raise click.ClickException(str(e))
+
 @cli.command()
 @click.argument('business_type')
 def guidelines(business_type: str) -> None:
@@ -4,9 +4,54 @@ Document store for managing insurance-related documents and guidelines.
 
 import os
 import json
+import mmap
+import time
+import orjson
 from pathlib import Path
-from typing import Dict, List, Optional, Any
-from datetime import datetime
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Set, Any, Union
+from .fs import ensure_dir
+
+# Separates documents in the search corpus; never part of a lowercased query match
+_CORPUS_SEPARATOR = "\x00"
+
+# Stores with fewer files than this are loaded without a thread pool
+_PARALLEL_LOAD_THRESHOLD = 256
+# Files read per thread pool task
+_LOAD_CHUNK_SIZE = 64
+# Document files at least this large are parsed from a read-only memory map
+_MMAP_THRESHOLD = 1 << 20
+
+def _read_document(doc_path: Path) -> Union[Dict[str, Any], Exception]:
+    """Read and parse one document file, returning the error if it fails.
+    
+    Large files are mapped rather than read, so orjson parses the page cache
+    directly instead of a full copy of the file.
+    """
+    try:
+        with open(doc_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < _MMAP_THRESHOLD:
+                return orjson.loads(f.read())
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                return orjson.loads(view)
+    except Exception as e:
+        return e
+
+def _read_documents(doc_paths: List[Path]) -> List[Union[Dict[str, Any], Exception]]:
+    """Read and parse a chunk of document files."""
+    return [_read_document(doc_path) for doc_path in doc_paths]
+
+def _write_document(doc_path: Path, doc: Dict[str, Any]) -> None:
+    """Write a document file atomically through a temporary file and rename.
+    
+    Readers and crashes see either the old or the new document, never a
+    partially written one. The temporary name doesn't match the store's
+    *.json glob, so a leftover one is never loaded.
+    """
+    tmp_path = doc_path.with_name(doc_path.name + ".tmp")
+    tmp_path.write_bytes(orjson.dumps(doc, option=orjson.OPT_INDENT_2))
+    os.replace(tmp_path, doc_path)
 
 class DocumentStore:
     """Store for managing insurance-related documents."""
@@ -14,20 +59,90 @@ class DocumentStore:
     def __init__(self, docs_dir: str = "data"):
         """Initialize the document store."""
         self.docs_dir = Path(docs_dir)
-        self.docs_dir.mkdir(parents=True, exist_ok=True)
+        ensure_dir(self.docs_dir)
         self.documents: Dict[str, Dict] = {}
+        # Doc IDs by type and by applicable state, plus each ID's position in
+        # self.documents so indexed lookups keep the store's order
+        self._by_type: Dict[str, Set[str]] = {}
+        self._by_state: Dict[str, Set[str]] = {}
+        self._positions: Dict[str, int] = {}
+        self._next_position = 0
+        # Formatted date and time of the last timestamped second
+        self._timestamp_second = -1
+        self._timestamp_prefix = ""
+        # Lowercased contents joined into one string, rebuilt lazily after changes
+        self._corpus: Optional[str] = None
+        self._corpus_ids: List[str] = []
+        self._corpus_starts: List[int] = []
+        # Lowercased JSON of each document's metadata, for metadata search
+        self._metadata_text: Dict[str, str] = {}
         self._load_documents()
     
     def _load_documents(self) -> None:
         """Load all documents from the store."""
-        for doc_path in self.docs_dir.glob("*.json"):
+        paths = list(self.docs_dir.glob("*.json"))
+        if len(paths) < _PARALLEL_LOAD_THRESHOLD:
+            results = list(map(_read_document, paths))
+        else:
+            # Overlap file reads across threads in chunks, so per-task overhead
+            # doesn't outweigh the overlap; inserting stays single-threaded
+            chunks = [paths[i:i + _LOAD_CHUNK_SIZE] for i in range(0, len(paths), _LOAD_CHUNK_SIZE)]
+            with ThreadPoolExecutor(max_workers=min(32, len(chunks))) as executor:
+                results = [
+                    result for chunk in executor.map(_read_documents, chunks)
+                    for result in chunk
+                ]
+        
+        for doc_path, result in zip(paths, results):
+            if isinstance(result, Exception):
+                print(f"Error loading document {doc_path}: {result}")
+                continue
             try:
-                with open(doc_path, "r") as f:
-                    doc = json.load(f)
-                    self.documents[doc["id"]] = doc
+                self._store(result)
             except Exception as e:
                 print(f"Error loading document {doc_path}: {e}")
     
+    def _timestamp(self) -> str:
+        """Get the current local time in ISO 8601 format with microseconds.
+        
+        The date and time part is formatted at most once per second; only
+        the fractional part is formatted on every call.
+        """
+        second, micros = divmod(time.time_ns() // 1000, 1_000_000)
+        if second != self._timestamp_second:
+            self._timestamp_prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(second))
+            self._timestamp_second = second
+        return f"{self._timestamp_prefix}.{micros:06d}"
+    
+    def _index(self, doc: Dict[str, Any]) -> None:
+        """Add a document to the type and state indices."""
+        self._by_type.setdefault(doc.get("type"), set()).add(doc["id"])
+        for state in doc.get("applicable_states", []):
+            self._by_state.setdefault(state, set()).add(doc["id"])
+    
+    def _unindex(self, doc: Dict[str, Any]) -> None:
+        """Remove a document from the type and state indices."""
+        self._by_type.get(doc.get("type"), set()).discard(doc["id"])
+        for state in doc.get("applicable_states", []):
+            self._by_state.get(state, set()).discard(doc["id"])
+    
+    def _store(self, doc: Dict[str, Any]) -> None:
+        """Put a document in memory and in the indices."""
+        doc_id = doc["id"]
+        if doc_id in self.documents:
+            self._unindex(self.documents[doc_id])
+        else:
+            self._positions[doc_id] = self._next_position
+            self._next_position += 1
+        self.documents[doc_id] = doc
+        self._index(doc)
+        self._metadata_text[doc_id] = json.dumps(doc.get("metadata", {})).lower()
+        self._corpus = None
+    
+    def _in_order(self, doc_ids: Set[str]) -> List[Dict[str, Any]]:
+        """Get documents by ID in store order."""
+        return [self.documents[doc_id] for doc_id in sorted(doc_ids, key=self._positions.__getitem__)]
+    
     def add_document(self, doc_id: str, title: str, content: str, metadata: Dict[str, Any]) -> None:
         """Add a new document to the store."""
         if not doc_id:
@@ -45,14 +160,12 @@ class DocumentStore:
             "content": content,
             "metadata": metadata,
             "type": metadata.get("type", "document"),
-            "last_updated": datetime.now().isoformat(),
+            "last_updated": self._timestamp(),
             "applicable_states": metadata.get("applicable_states", ["all"])
         }
         
-        doc_path = self.docs_dir / f"{doc_id}.json"
-        with open(doc_path, 'w') as f:
-            json.dump(doc, f, indent=2)
-        self.documents[doc_id] = doc
+        _write_document(self.docs_dir / f"{doc_id}.json", doc)
+        self._store(doc)
     
     def get_document(self, doc_id: str) -> Dict[str, Any]:
         """Retrieve a document by ID."""
@@ -64,22 +177,49 @@ class DocumentStore:
         """List all documents in the store."""
         return list(self.documents.values())
     
+    def _build_corpus(self) -> str:
+        """Join lowercased document contents into one searchable string."""
+        self._corpus_ids = list(self.documents)
+        contents = [doc["content"].lower() for doc in self.documents.values()]
+        self._corpus_starts = []
+        start = 0
+        for content in contents:
+            self._corpus_starts.append(start)
+            start += len(content) + len(_CORPUS_SEPARATOR)
+        self._corpus = _CORPUS_SEPARATOR.join(contents)
+        return self._corpus
+    
+    def _content_matches(self, query: str) -> Iterator[str]:
+        """Yield the IDs of documents whose lowercased content contains query.
+        
+        Scans the whole corpus with str.find and skips to the next document
+        after each match, so the search runs in C rather than per document.
+        """
+        corpus = self._corpus if self._corpus is not None else self._build_corpus()
+        if not self._corpus_ids or _CORPUS_SEPARATOR in query:
+            return
+        
+        starts = self._corpus_starts
+        pos = corpus.find(query)
+        while pos != -1:
+            i = bisect_right(starts, pos) - 1
+            yield self._corpus_ids[i]
+            if i + 1 == len(starts):
+                return
+            pos = corpus.find(query, starts[i + 1])
+    
     def search_documents(self, query: str, search_metadata: bool = False) -> List[Dict[str, Any]]:
         """Search documents by content and optionally metadata."""
         query = query.lower()
-        results = []
+        content_ids = set(self._content_matches(query))
+        if not search_metadata:
+            return [self.documents[doc_id] for doc_id in self.documents if doc_id in content_ids]
         
-        for doc in self.documents.values():
-            # Search in content
-            if query in doc["content"].lower():
+        results = []
+        for doc_id, doc in self.documents.items():
+            # Search in content, then in metadata
+            if doc_id in content_ids or query in self._metadata_text[doc_id]:
                 results.append(doc)
-                continue
-            
-            # Search in metadata if requested
-            if search_metadata:
-                metadata_str = json.dumps(doc["metadata"]).lower()
-                if query in metadata_str:
-                    results.append(doc)
         
         return results
     
@@ -90,11 +230,18 @@ class DocumentStore:
         
         doc_path = self.docs_dir / f"{doc_id}.json"
         doc_path.unlink()
-        del self.documents[doc_id]
+        self._unindex(self.documents.pop(doc_id))
+        del self._positions[doc_id]
+        del self._metadata_text[doc_id]
+        self._corpus = None
     
     def update_document(self, doc_id: str, **kwargs) -> None:
-        """Update a document's fields."""
-        doc = self.get_document(doc_id)
+        """Update a document's fields.
+        
+        The update is applied to a copy, which replaces the stored document
+        only once it has been saved, so a failed write leaves the store as it was.
+        """
+        doc = dict(self.get_document(doc_id))
         
         # Update only provided fields
         for key, value in kwargs.items():
@@ -102,33 +249,20 @@ class DocumentStore:
                 doc[key] = value
         
         # Update last_updated timestamp
-        doc["last_updated"] = datetime.now().isoformat()
+        doc["last_updated"] = self._timestamp()
         
         # Save updated document
-        doc_path = self.docs_dir / f"{doc_id}.json"
-        with open(doc_path, 'w') as f:
-            json.dump(doc, f, indent=2)
-        self.documents[doc_id] = doc
+        _write_document(self.docs_dir / f"{doc_id}.json", doc)
+        self._store(doc)
     
     def get_documents_by_type(self, doc_type: str) -> List[Dict[str, Any]]:
         """Get all documents of a specific type."""
-        return [doc for doc in self.documents.values() if doc["type"] == doc_type]
+        return self._in_order(self._by_type.get(doc_type, set()))
     
     def get_documents_by_state(self, state: str) -> List[Dict[str, Any]]:
         """Get all documents specific to a state."""
-        return [
-            doc for doc in self.documents.values()
-            if state in doc.get("applicable_states", []) or "all" in doc.get("applicable_states", [])
-        ]
+        return self._in_order(self._by_state.get(state, set()) | self._by_state.get("all", set()))
     
     def semantic_search(self, query: str) -> List[str]:
         """Perform semantic search on document contents."""
-        query = query.lower()
-        results = []
-        
-        for doc in self.documents.values():
-            content = doc["content"].lower()
-            if query in content:
-                results.append(doc["content"])
-        
-        return results
\ No newline at end of file
+        return [self.documents[doc_id]["content"] for doc_id in self._content_matches(query.lower())]
\ No newline at end of file
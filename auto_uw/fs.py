@@ -0,0 +1,16 @@
+"""
+Filesystem helpers shared across the Auto UW package.
+"""
+
+import os
+from typing import Set, Union
+
+# Absolute paths of directories already created or found during this process
+_ENSURED_DIRS: Set[str] = set()
+
+def ensure_dir(path: Union[str, os.PathLike]) -> None:
+    """Create a directory and its parents unless this process already has."""
+    key = os.path.abspath(path)
+    if key not in _ENSURED_DIRS:
+        os.makedirs(key, exist_ok=True)
+        _ENSURED_DIRS.add(key)
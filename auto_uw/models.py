@@ -2,12 +2,31 @@
 Data models for the Auto UW package.
 """
 
+import re
 from typing import List, Dict, Any, Optional
-from datetime import datetime
-from pydantic import BaseModel, Field, field_validator, constr
+from datetime import date
+from functools import cached_property
+import numpy as np
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, field_validator, constr
+
+_DATE_PATTERN = re.compile(r'[0-9]{4}-[0-9]{2}-[0-9]{2}')
+
+VALID_CLAIM_TYPES = frozenset({'property', 'liability', 'workers_comp', 'auto'})
+
+VALID_STATES = frozenset({
+    'AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'FL', 'GA',
+    'HI', 'ID', 'IL', 'IN', 'IA', 'KS', 'KY', 'LA', 'ME', 'MD',
+    'MA', 'MI', 'MN', 'MS', 'MO', 'MT', 'NE', 'NV', 'NH', 'NJ',
+    'NM', 'NY', 'NC', 'ND', 'OH', 'OK', 'OR', 'PA', 'RI', 'SC',
+    'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA', 'WV', 'WI', 'WY'
+})
+
+VALID_DOC_TYPES = frozenset({'guideline', 'regulation', 'assessment', 'policy'})
 
 class Claim(BaseModel):
     """Model for insurance claims."""
+    model_config = ConfigDict(frozen=True)
+
     date: str
     type: str
     amount: float
@@ -15,8 +34,11 @@ class Claim(BaseModel):
     @field_validator('date')
     def validate_date(cls, v):
         """Validate date format."""
+        # date() rejects out-of-range months and days, including Feb 29 off leap years
         try:
-            datetime.strptime(v, '%Y-%m-%d')
+            if not _DATE_PATTERN.fullmatch(v):
+                raise ValueError
+            date(int(v[:4]), int(v[5:7]), int(v[8:]))
         except ValueError:
             raise ValueError('Date must be in YYYY-MM-DD format')
         return v
@@ -24,9 +46,8 @@ class Claim(BaseModel):
     @field_validator('type')
     def validate_type(cls, v):
         """Validate claim type."""
-        valid_types = {'property', 'liability', 'workers_comp', 'auto'}
-        if v not in valid_types:
-            raise ValueError(f'Claim type must be one of {valid_types}')
+        if v not in VALID_CLAIM_TYPES:
+            raise ValueError(f'Claim type must be one of {set(VALID_CLAIM_TYPES)}')
         return v
 
     @field_validator('amount')
@@ -36,16 +57,17 @@ class Claim(BaseModel):
             raise ValueError('Claim amount must be positive')
         return v
 
-    def model_dump(self, *args, **kwargs):
-        """Convert to dictionary for JSON serialization."""
-        return {
-            "date": self.date,
-            "type": self.type,
-            "amount": self.amount
-        }
+    @classmethod
+    def from_list(cls, raws: List[Dict[str, Any]]) -> List["Claim"]:
+        """Validate and build many claims in a single pydantic-core call."""
+        return _CLAIM_LIST.validate_python(raws)
+
+_CLAIM_LIST = TypeAdapter(List[Claim])
 
 class PolicyRequest(BaseModel):
     """Model for insurance policy requests."""
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     business_name: str
     business_type: str
     annual_revenue: float
@@ -55,20 +77,20 @@ class PolicyRequest(BaseModel):
     years_in_business: int
     business_description: str
     claims_history: List[Claim] = Field(default_factory=list)
+    additional_notes: Optional[str] = None
+
+    @field_validator('business_type')
+    def validate_business_type(cls, v):
+        """Normalize business type to lowercase."""
+        return v.strip().lower()
 
     @field_validator('state')
     def validate_state(cls, v):
         """Validate state code."""
-        valid_states = {
-            'AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'FL', 'GA',
-            'HI', 'ID', 'IL', 'IN', 'IA', 'KS', 'KY', 'LA', 'ME', 'MD',
-            'MA', 'MI', 'MN', 'MS', 'MO', 'MT', 'NE', 'NV', 'NH', 'NJ',
-            'NM', 'NY', 'NC', 'ND', 'OH', 'OK', 'OR', 'PA', 'RI', 'SC',
-            'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA', 'WV', 'WI', 'WY'
-        }
-        if v.upper() not in valid_states:
-            raise ValueError(f'State must be a valid US state code')
-        return v.upper()
+        v = v.upper()
+        if v not in VALID_STATES:
+            raise ValueError('State must be a valid US state code')
+        return v
 
     @field_validator('annual_revenue')
     def validate_revenue(cls, v):
@@ -91,19 +113,16 @@ class PolicyRequest(BaseModel):
             raise ValueError('Business description cannot be empty')
         return v.strip()
 
-    def model_dump(self, *args, **kwargs):
-        """Convert to dictionary for JSON serialization."""
-        return {
-            "business_name": self.business_name,
-            "business_type": self.business_type,
-            "annual_revenue": self.annual_revenue,
-            "employee_count": self.employee_count,
-            "state": self.state,
-            "city": self.city,
-            "years_in_business": self.years_in_business,
-            "business_description": self.business_description,
-            "claims_history": [claim.model_dump() for claim in self.claims_history]
-        }
+    @cached_property
+    def claim_amounts(self) -> np.ndarray:
+        """Claim amounts as an array, built once per request."""
+        return np.fromiter((claim.amount for claim in self.claims_history),
+                           dtype=np.float64, count=len(self.claims_history))
+
+    @cached_property
+    def dumped(self) -> Dict[str, Any]:
+        """The model_dump() output, built once per request; treat as read-only."""
+        return self.model_dump()
 
 class Document(BaseModel):
     """Model for storing documents in the document store."""
@@ -137,7 +156,6 @@ class Document(BaseModel):
     @field_validator('doc_type')
     def validate_doc_type(cls, v):
         """Validate document type."""
-        valid_types = {'guideline', 'regulation', 'assessment', 'policy'}
-        if v not in valid_types:
-            raise ValueError(f'Document type must be one of {valid_types}')
+        if v not in VALID_DOC_TYPES:
+            raise ValueError(f'Document type must be one of {set(VALID_DOC_TYPES)}')
         return v 
\ No newline at end of file
@@ -0,0 +1,125 @@
+"""
+Premium factor tables and vectorized/compiled kernels for bulk premium scoring.
+"""
+
+from types import MappingProxyType
+from typing import Any, Mapping, Sequence, Tuple
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:  # pragma: no cover - numba is an optional accelerator
+    prange = range
+
+    def njit(*args: Any, **kwargs: Any) -> Any:
+        """Fallback decorator that leaves the function uncompiled."""
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+# Base rates by business type; keys are lowercase to match PolicyRequest.business_type
+BASE_RATES: Mapping[str, float] = MappingProxyType({
+    'restaurant': 5000.0,
+    'retail': 4000.0,
+    'manufacturing': 8000.0,
+    'construction': 10000.0,
+    'professional_services': 3000.0
+})
+DEFAULT_BASE_RATE = 5000.0
+
+# Premium factor tables: a value below THRESHOLDS[i] gets FACTORS[i], and a
+# value at or above the last threshold gets FACTORS[-1]
+REVENUE_THRESHOLDS = np.array([500000.0, 1000000.0, 2000000.0])
+REVENUE_FACTORS = np.array([0.8, 1.0, 1.2, 1.5])
+EMPLOYEE_THRESHOLDS = np.array([10, 25, 50])
+EMPLOYEE_FACTORS = np.array([0.8, 1.0, 1.2, 1.5])
+YEARS_THRESHOLDS = np.array([2, 5, 10])
+YEARS_FACTORS = np.array([1.2, 1.1, 1.0, 0.9])
+
+def bucket_factor(thresholds: np.ndarray, factors: np.ndarray, values: Any) -> np.ndarray:
+    """Look up the factor for each value in a bucketed factor table."""
+    return factors[np.searchsorted(thresholds, values, side='right')]
+
+def claims_factor_vec(n_claims: Any, total_claim_amt: Any) -> np.ndarray:
+    """Calculate claims history factors from claim counts and total amounts."""
+    n_claims = np.asarray(n_claims)
+    total_claim_amt = np.asarray(total_claim_amt)
+    return np.select(
+        [
+            n_claims == 0,
+            (n_claims == 1) & (total_claim_amt < 5000),
+            n_claims == 1,
+            n_claims == 2
+        ],
+        [0.9, 1.1, 1.2, 1.3],
+        default=1.5
+    )
+
+def calc_premium_vec(revenue: Any, employees: Any, years: Any, n_claims: Any,
+                     total_claim_amt: Any, base_rate: Any) -> np.ndarray:
+    """Calculate premiums element-wise over arrays of policy attributes."""
+    return (
+        np.asarray(base_rate, dtype=np.float64)
+        * bucket_factor(REVENUE_THRESHOLDS, REVENUE_FACTORS, revenue)
+        * bucket_factor(EMPLOYEE_THRESHOLDS, EMPLOYEE_FACTORS, employees)
+        * claims_factor_vec(n_claims, total_claim_amt)
+        * bucket_factor(YEARS_THRESHOLDS, YEARS_FACTORS, years)
+    )
+
+@njit(cache=True)
+def _bucket(thresholds: np.ndarray, factors: np.ndarray, value: float) -> float:
+    """Scalar factor table lookup for use inside compiled kernels."""
+    for i in range(thresholds.shape[0]):
+        if value < thresholds[i]:
+            return factors[i]
+    return factors[-1]
+
+@njit(cache=True, parallel=True, fastmath=True)
+def premium_kernel(base: np.ndarray, rev: np.ndarray, emp: np.ndarray, yrs: np.ndarray,
+                   nclaims: np.ndarray, claim_amt: np.ndarray, out: np.ndarray) -> None:
+    """Write the premium for each policy in a struct-of-arrays batch into ``out``."""
+    for i in prange(base.shape[0]):
+        n = nclaims[i]
+        if n == 0:
+            claims_factor = 0.9
+        elif n == 1 and claim_amt[i] < 5000:
+            claims_factor = 1.1
+        elif n == 1:
+            claims_factor = 1.2
+        elif n == 2:
+            claims_factor = 1.3
+        else:
+            claims_factor = 1.5
+
+        out[i] = (
+            base[i]
+            * _bucket(REVENUE_THRESHOLDS, REVENUE_FACTORS, rev[i])
+            * _bucket(EMPLOYEE_THRESHOLDS, EMPLOYEE_FACTORS, emp[i])
+            * claims_factor
+            * _bucket(YEARS_THRESHOLDS, YEARS_FACTORS, yrs[i])
+        )
+
+def claims_arrays(claim_amounts: Sequence[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Reduce per-policy claim amount arrays to claim counts and total amounts."""
+    count = len(claim_amounts)
+    n_claims = np.fromiter((amounts.size for amounts in claim_amounts),
+                           dtype=np.int64, count=count)
+    total_amount = np.fromiter((amounts.sum() for amounts in claim_amounts),
+                               dtype=np.float64, count=count)
+    return n_claims, total_amount
+
+def score_premiums(requests: Sequence[Any]) -> np.ndarray:
+    """Calculate premiums for many policy requests in a single compiled pass."""
+    count = len(requests)
+    base = np.fromiter(
+        (BASE_RATES.get(request.business_type, DEFAULT_BASE_RATE) for request in requests),
+        dtype=np.float64, count=count
+    )
+    rev = np.fromiter((request.annual_revenue for request in requests), dtype=np.float64, count=count)
+    emp = np.fromiter((request.employee_count for request in requests), dtype=np.int64, count=count)
+    yrs = np.fromiter((request.years_in_business for request in requests), dtype=np.int64, count=count)
+    n_claims, total_amount = claims_arrays([request.claim_amounts for request in requests])
+
+    out = np.empty(count, dtype=np.float64)
+    premium_kernel(base, rev, emp, yrs, n_claims, total_amount, out)
+    return out
@@ -0,0 +1,78 @@
+"""
+Client-side rate limiting for Anthropic requests.
+"""
+
+import asyncio
+import weakref
+from typing import Optional
+
+class AsyncRateLimiter:
+    """Token bucket that spaces out requests to stay under a rate limit.
+
+    Up to ``burst`` requests may start at once; after that, capacity refills
+    at ``rate`` requests per second. Callers wait for a token rather than
+    sending a request the API would reject.
+    """
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        """Initialize the limiter with a rate in requests per second."""
+        if rate <= 0:
+            raise ValueError("Rate must be positive")
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated: Optional[float] = None
+        self._locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    async def acquire(self, tokens: float = 1) -> None:
+        """Wait until a request costing ``tokens`` may be sent.
+
+        Costs above the burst size are capped at it, so an oversized request
+        waits for a full bucket instead of forever.
+        """
+        # Create one lock per running loop so the limiter can be reused
+        # across asyncio.run calls
+        loop = asyncio.get_running_loop()
+        lock = self._locks.get(loop)
+        if lock is None:
+            lock = self._locks[loop] = asyncio.Lock()
+
+        tokens = min(tokens, self.burst)
+        async with lock:
+            while True:
+                now = loop.time()
+                if self._updated is not None:
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+    async def __aenter__(self) -> "AsyncRateLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        return None
+
+class AnthropicRateLimiter:
+    """Per-minute request and token budgets for Anthropic API calls.
+
+    Mirrors the API's RPM and TPM limits with one token bucket each, so a
+    call waits until both budgets allow it. Either limit may be omitted.
+    """
+
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None):
+        """Initialize the limiter with requests and tokens per minute."""
+        self.rpm = AsyncRateLimiter(rpm / 60, burst=int(rpm)) if rpm else None
+        self.tpm = AsyncRateLimiter(tpm / 60, burst=int(tpm)) if tpm else None
+
+    async def acquire(self, n_tokens: int = 0) -> None:
+        """Wait until a request using about n_tokens tokens may be sent."""
+        if self.rpm is not None:
+            await self.rpm.acquire()
+        if self.tpm is not None and n_tokens:
+            await self.tpm.acquire(n_tokens)
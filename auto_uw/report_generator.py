@@ -4,14 +4,68 @@ Module for generating PDF reports of insurance quotes.
 
 import os
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle, StyleSheet1
 from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib.enums import TA_LEFT, TA_CENTER
+from .fs import ensure_dir
+
+@lru_cache(maxsize=1)
+def _styles() -> StyleSheet1:
+    """Build the report stylesheet once; it is shared by every generator."""
+    styles = getSampleStyleSheet()
+    
+    # Create custom styles
+    styles.add(ParagraphStyle(
+        name='QuoteTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        spaceAfter=30,
+        alignment=TA_CENTER
+    ))
+    
+    styles.add(ParagraphStyle(
+        name='QuoteSubtitle',
+        parent=styles['Heading2'],
+        fontSize=16,
+        spaceAfter=20
+    ))
+    
+    styles.add(ParagraphStyle(
+        name='QuoteBody',
+        parent=styles['Normal'],
+        fontSize=12,
+        spaceAfter=12
+    ))
+    return styles
+
+# Table styles shared by every report
+_LABEL_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+])
+_CLAIMS_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+])
+
+# Space between report sections; spacers hold no layout state so one is reused
+_SECTION_SPACER = Spacer(1, 20)
+
+def _bullets(items: List[str], style: ParagraphStyle) -> Paragraph:
+    """Render a bulleted list as a single multi-line paragraph."""
+    return Paragraph("<br/>".join(f"• {item}" for item in items), style)
 
 class QuoteReportGenerator:
     """Generates PDF reports for insurance quotes."""
@@ -19,31 +73,8 @@ class QuoteReportGenerator:
     def __init__(self, quotes_dir: str = "quotes"):
         """Initialize the report generator."""
         self.quotes_dir = Path(quotes_dir)
-        self.quotes_dir.mkdir(parents=True, exist_ok=True)
-        self.styles = getSampleStyleSheet()
-        
-        # Create custom styles
-        self.styles.add(ParagraphStyle(
-            name='QuoteTitle',
-            parent=self.styles['Heading1'],
-            fontSize=24,
-            spaceAfter=30,
-            alignment=TA_CENTER
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            name='QuoteSubtitle',
-            parent=self.styles['Heading2'],
-            fontSize=16,
-            spaceAfter=20
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            name='QuoteBody',
-            parent=self.styles['Normal'],
-            fontSize=12,
-            spaceAfter=12
-        ))
+        ensure_dir(self.quotes_dir)
+        self.styles = _styles()
     
     def _create_header(self, quote_id: str, business_name: str) -> list:
         """Create the header section of the report."""
@@ -60,15 +91,10 @@ class QuoteReportGenerator:
         ]
         
         header_table = Table(header_data, colWidths=[2*inch, 4*inch])
-        header_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ]))
+        header_table.setStyle(_LABEL_TABLE_STYLE)
         
         elements.append(header_table)
-        elements.append(Spacer(1, 20))
+        elements.append(_SECTION_SPACER)
         
         return elements
     
@@ -87,20 +113,15 @@ class QuoteReportGenerator:
         ]
         
         business_table = Table(business_data, colWidths=[2*inch, 4*inch])
-        business_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ]))
+        business_table.setStyle(_LABEL_TABLE_STYLE)
         
         elements.append(business_table)
-        elements.append(Spacer(1, 20))
+        elements.append(_SECTION_SPACER)
         
         # Business Description
         elements.append(Paragraph("Business Description:", self.styles['QuoteBody']))
         elements.append(Paragraph(request['business_description'], self.styles['QuoteBody']))
-        elements.append(Spacer(1, 20))
+        elements.append(_SECTION_SPACER)
         
         # Claims History
         elements.append(Paragraph("Claims History:", self.styles['QuoteBody']))
@@ -114,19 +135,12 @@ class QuoteReportGenerator:
                 ])
             
             claims_table = Table(claims_data, colWidths=[2*inch, 2*inch, 2*inch])
-            claims_table.setStyle(TableStyle([
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ]))
+            claims_table.setStyle(_CLAIMS_TABLE_STYLE)
             elements.append(claims_table)
         else:
             elements.append(Paragraph("No previous claims", self.styles['QuoteBody']))
         
-        elements.append(Spacer(1, 20))
+        elements.append(_SECTION_SPACER)
         return elements
     
     def _create_risk_assessment(self, response: Dict[str, Any]) -> list:
@@ -143,35 +157,28 @@ class QuoteReportGenerator:
         ]
         
         risk_table = Table(risk_data, colWidths=[2*inch, 4*inch])
-        risk_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ]))
+        risk_table.setStyle(_LABEL_TABLE_STYLE)
         
         elements.append(risk_table)
-        elements.append(Spacer(1, 20))
+        elements.append(_SECTION_SPACER)
         
         # Special Considerations
         elements.append(Paragraph("Special Considerations:", self.styles['QuoteBody']))
         if response['special_considerations']:
-            for consideration in response['special_considerations']:
-                elements.append(Paragraph(f"• {consideration}", self.styles['QuoteBody']))
+            elements.append(_bullets(response['special_considerations'], self.styles['QuoteBody']))
         else:
             elements.append(Paragraph("No special considerations identified", self.styles['QuoteBody']))
         
-        elements.append(Spacer(1, 20))
+        elements.append(_SECTION_SPACER)
         
         # Recommended Coverage
         elements.append(Paragraph("Recommended Coverage:", self.styles['QuoteBody']))
         if response['recommended_coverage']:
-            for coverage in response['recommended_coverage']:
-                elements.append(Paragraph(f"• {coverage}", self.styles['QuoteBody']))
+            elements.append(_bullets(response['recommended_coverage'], self.styles['QuoteBody']))
         else:
             elements.append(Paragraph("Standard coverage recommended", self.styles['QuoteBody']))
         
-        elements.append(Spacer(1, 20))
+        elements.append(_SECTION_SPACER)
         return elements
     
     def _create_model_analysis(self, model_response: str) -> list:
@@ -179,7 +186,7 @@ class QuoteReportGenerator:
         elements = []
         elements.append(Paragraph("Model Analysis", self.styles['QuoteSubtitle']))
         elements.append(Paragraph(model_response, self.styles['QuoteBody']))
-        elements.append(Spacer(1, 20))
+        elements.append(_SECTION_SPACER)
         return elements
     
     def generate_report(self, 
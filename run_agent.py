@@ -3,8 +3,10 @@ Script to run the underwriting agent.
 """
 
 import os
+import asyncio
 from dotenv import load_dotenv
-from auto_uw.agent import UnderwritingAgent, PolicyRequest
+from auto_uw.agent import UnderwritingAgent
+from auto_uw.models import PolicyRequest
 
 def main():
     # Load environment variables
@@ -33,15 +35,15 @@ def main():
         Has a liquor license and serves wine and beer.
         """,
         claims_history=[
-            {"date": "2023-01-15", "type": "slip_and_fall", "amount": 5000.0},
-            {"date": "2022-06-20", "type": "property_damage", "amount": 2500.0}
+            {"date": "2023-01-15", "type": "liability", "amount": 5000.0},
+            {"date": "2022-06-20", "type": "property", "amount": 2500.0}
         ],
         additional_notes="Recently renovated kitchen with new fire suppression system."
     )
     
     # Process the request
     try:
-        quote_response = agent.process_policy_request(example_request)
+        quote_response = asyncio.run(agent.process_policy_request(example_request))
         print("\nQuote Response:")
         print("-" * 50)
         print(f"Business: {quote_response['business_name']}")
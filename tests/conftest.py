@@ -0,0 +1,31 @@
+"""
+Shared fixtures for the Auto UW test suite.
+"""
+
+import os
+import pytest
+from unittest.mock import patch
+
+@pytest.fixture(scope="session", autouse=True)
+def _warm_imports():
+    """Import the package and load its compiled kernels before the first test.
+    
+    Test modules import auto_uw at collection, but the numba premium kernel
+    is only compiled or loaded from cache on its first call; doing that here
+    keeps the cost out of whichever test happens to run first.
+    """
+    import auto_uw.agent, auto_uw.cli, auto_uw.document_store, auto_uw.models  # noqa: F401
+    from auto_uw.pricing_kernels import score_premiums
+    score_premiums([])
+
+@pytest.fixture(scope="session", autouse=True)
+def mock_anthropic():
+    """Mock the Anthropic client class so no test builds a real client."""
+    with patch('auto_uw.agent.AsyncAnthropic') as mock:
+        yield mock
+
+@pytest.fixture(scope="session")
+def api_key():
+    """Set a test API key for the whole session."""
+    with patch.dict(os.environ, {'ANTHROPIC_API_KEY': 'test_key'}):
+        yield 'test_key'
@@ -4,27 +4,52 @@ Tests for the UnderwritingAgent class.
 
 import os
 import json
+import asyncio
 import pytest
-from unittest.mock import Mock, patch
+import httpx
+import anthropic
+from unittest.mock import AsyncMock, Mock, patch
 from datetime import datetime
-from auto_uw.agent import UnderwritingAgent
+from types import SimpleNamespace
+from fastapi.testclient import TestClient
+from auto_uw.agent import GROUP_TIMEOUT_PER_REQUEST, UnderwritingAgent, _close_http_client, _shutdown_pdf_pool, app
+from auto_uw.cache import AnalysisCache
 from auto_uw.models import PolicyRequest, Claim
+from auto_uw.pricing_kernels import score_premiums
 
-@pytest.fixture
-def mock_anthropic():
-    """Mock Anthropic client."""
-    with patch('auto_uw.agent.Anthropic') as mock:
-        yield mock
-
-@pytest.fixture
-def agent(mock_anthropic):
+@pytest.fixture(scope="module")
+def agent(mock_anthropic, api_key):
     """Create an UnderwritingAgent instance with mocked dependencies."""
-    with patch.dict(os.environ, {'ANTHROPIC_API_KEY': 'test_key'}):
-        agent = UnderwritingAgent()
-        agent.client = Mock()
-        return agent
+    agent = UnderwritingAgent()
+    agent.client = AsyncMock()
+    return agent
+
+@pytest.fixture(autouse=True)
+def reset_agent(request):
+    """Reset the shared agent's mocked client and per-test settings."""
+    if "agent" not in request.fixturenames:
+        yield
+        return
+    agent = request.getfixturevalue("agent")
+    cache, rate_limiter = agent.cache, agent.rate_limiter
+    agent.client.reset_mock(side_effect=True, return_value=True)
+    yield
+    agent.cache, agent.rate_limiter = cache, rate_limiter
 
 @pytest.fixture
+def fast_pdf(tmp_path):
+    """Replace PDF rendering with a minimal sentinel file in tmp_path."""
+    async def write_sentinel(self, request, analysis, premium, factors=None, generated_at=None,
+                             report_id=None):
+        timestamp = f"{(generated_at or datetime.now()):%Y%m%d_%H%M%S}"
+        report_path = tmp_path / f"quote_{timestamp}_{report_id}.pdf"
+        report_path.write_bytes(b"%PDF-1.4\n%%EOF")
+        return str(report_path)
+    
+    with patch.object(UnderwritingAgent, "_generate_report_async", write_sentinel):
+        yield
+
+@pytest.fixture(scope="session")
 def sample_request():
     """Create a sample policy request."""
     return PolicyRequest(
@@ -45,7 +70,12 @@ def sample_request():
         ]
     )
 
-@pytest.fixture
+@pytest.fixture(scope="session")
+def sample_request_dict(sample_request):
+    """Dump the sample request once; tests copy it rather than mutating it."""
+    return sample_request.model_dump()
+
+@pytest.fixture(scope="session")
 def sample_risk_evaluation():
     """Create a sample risk evaluation response."""
     return {
@@ -58,7 +88,7 @@ def sample_risk_evaluation():
         "risk_score": 65
     }
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_decision():
     """Create a sample underwriting decision response."""
     return {
@@ -71,21 +101,33 @@ def sample_decision():
         "explanation": "Business shows moderate risk but meets underwriting criteria"
     }
 
+def tool_response(tool_input):
+    """Build a stub Claude response carrying tool_input as its tool call."""
+    return SimpleNamespace(content=[SimpleNamespace(type="tool_use", input=tool_input)])
+
+@pytest.fixture(scope="session")
+def risk_response_mock(sample_risk_evaluation):
+    """Mocked Claude response reporting the sample risk evaluation."""
+    return tool_response(sample_risk_evaluation)
+
+@pytest.fixture(scope="session")
+def decision_response_mock(sample_decision):
+    """Mocked Claude response reporting the sample decision."""
+    return tool_response(sample_decision)
+
 def test_agent_initialization(agent):
     """Test agent initialization."""
     assert agent.api_key == 'test_key'
     assert agent.model == 'claude-3-sonnet-20240229'
     assert agent.client is not None
 
-def test_evaluate_risk(agent, sample_request, sample_risk_evaluation):
+def test_evaluate_risk(agent, sample_request, sample_risk_evaluation, risk_response_mock):
     """Test risk evaluation."""
     # Mock Claude's response
-    mock_response = Mock()
-    mock_response.content = [Mock(text=json.dumps(sample_risk_evaluation))]
-    agent.client.messages.create.return_value = mock_response
+    agent.client.messages.create.return_value = risk_response_mock
     
     # Test risk evaluation
-    result = agent.evaluate_risk(sample_request)
+    result = asyncio.run(agent.evaluate_risk(sample_request))
     
     # Verify results
     assert result == sample_risk_evaluation
@@ -94,53 +136,44 @@ def test_evaluate_risk(agent, sample_request, sample_risk_evaluation):
     assert isinstance(result['risk_score'], int)
     
     # Verify API call
-    agent.client.messages.create.assert_called_once()
+    agent.client.messages.create.assert_awaited_once()
     call_args = agent.client.messages.create.call_args[1]
     assert call_args['model'] == agent.model
     assert call_args['max_tokens'] == 1000
     assert call_args['temperature'] == 0.7
+    assert call_args['tool_choice'] == {'type': 'tool', 'name': 'report_risk'}
+    assert call_args['system'][0]['cache_control'] == {'type': 'ephemeral'}
+    assert call_args['messages'][0]['content'][0]['cache_control'] == {'type': 'ephemeral'}
 
-def test_make_decision(agent, sample_request, sample_risk_evaluation, sample_decision):
+def test_make_decision(agent, sample_request, sample_risk_evaluation, risk_response_mock, fast_pdf):
     """Test underwriting decision making."""
-    # Mock Claude's responses
-    mock_risk_response = Mock()
-    mock_risk_response.content = [Mock(text=json.dumps(sample_risk_evaluation))]
-    mock_decision_response = Mock()
-    mock_decision_response.content = [Mock(text=json.dumps(sample_decision))]
-    
-    agent.client.messages.create.side_effect = [
-        mock_risk_response,
-        mock_decision_response
-    ]
+    # Mock Claude's response
+    agent.client.messages.create.return_value = risk_response_mock
     
     # Test decision making
-    result = agent.make_decision(sample_request)
+    result = asyncio.run(agent.make_decision(sample_request))
     
     # Verify results
-    assert result == sample_decision
-    assert result['decision'] in ['approved', 'declined', 'review']
+    assert result['risk_profile'] == sample_risk_evaluation['risk_profile']
     assert isinstance(result['premium_estimate'], float)
     assert isinstance(result['conditions'], list)
     assert isinstance(result['explanation'], str)
+    assert result['quote_id'].split('_', 1)[1] in result['report_path']
     
-    # Verify API calls
-    assert agent.client.messages.create.call_count == 2
+    # Conditions and explanation are derived locally from a single LLM call
+    assert agent.client.messages.create.call_count == 1
 
-def test_process_policy_request(agent, sample_request, sample_risk_evaluation, sample_decision):
+def test_process_policy_request(agent, sample_request, sample_risk_evaluation, risk_response_mock,
+                                decision_response_mock, fast_pdf):
     """Test complete policy request processing."""
     # Mock Claude's responses
-    mock_risk_response = Mock()
-    mock_risk_response.content = [Mock(text=json.dumps(sample_risk_evaluation))]
-    mock_decision_response = Mock()
-    mock_decision_response.content = [Mock(text=json.dumps(sample_decision))]
-    
     agent.client.messages.create.side_effect = [
-        mock_risk_response,
-        mock_decision_response
+        risk_response_mock,
+        decision_response_mock
     ]
     
     # Test request processing
-    result = agent.process_policy_request(sample_request)
+    result = asyncio.run(agent.process_policy_request(sample_request))
     
     # Verify results
     assert 'quote_id' in result
@@ -155,65 +188,241 @@ def test_process_policy_request(agent, sample_request, sample_risk_evaluation, s
     # Verify report file was created
     assert os.path.exists(result['report_path'])
 
-def test_calculate_base_rate(agent, sample_request):
+def test_process_policy_request_uses_cache(agent, sample_request, risk_response_mock, tmp_path,
+                                           fast_pdf):
+    """Test that identical requests reuse Claude's cached analysis."""
+    agent.cache = AnalysisCache(tmp_path)
+    agent.client.messages.create.return_value = risk_response_mock
+    
+    first = asyncio.run(agent.process_policy_request(sample_request))
+    second = asyncio.run(agent.process_policy_request(sample_request))
+    
+    # The analysis is reused but each call still gets its own quote
+    agent.client.messages.create.assert_awaited_once()
+    assert first['quote_id'] != second['quote_id']
+    assert first['risk_profile'] == second['risk_profile']
+    assert len(list(tmp_path.glob('*.json'))) == 1
+
+@pytest.mark.parametrize("business_type,expected_rate", [
+    ("restaurant", 5000.0),
+    ("retail", 4000.0),
+    ("professional_services", 3000.0),
+    ("manufacturing", 8000.0),
+    ("construction", 10000.0),
+    ("unknown_type", 5000.0)  # Default rate
+])
+def test_calculate_base_rate(agent, business_type, expected_rate):
     """Test base rate calculation."""
-    # Test different business types
-    test_cases = [
-        ("restaurant", 0.015),
-        ("retail", 0.012),
-        ("professional_services", 0.008),
-        ("manufacturing", 0.020),
-        ("construction", 0.025),
-        ("unknown_type", 0.015)  # Default rate
+    # The base rate depends only on the business type, so no request is built
+    assert agent._calculate_base_rate(business_type) == expected_rate
+
+def test_score_premiums_matches_scalar(agent, sample_request_dict):
+    """Test bulk premium scoring against the per-request calculation."""
+    requests = [
+        PolicyRequest(**{
+            **sample_request_dict,
+            "annual_revenue": revenue,
+            "employee_count": employees,
+            "years_in_business": years,
+            "claims_history": claims
+        })
+        for revenue in (100000, 500000, 1500000, 3000000)
+        for employees in (5, 10, 30, 60)
+        for years in (1, 2, 7, 12)
+        for claims in ([], sample_request_dict["claims_history"])
     ]
     
-    for business_type, expected_rate in test_cases:
-        request = PolicyRequest(**{**sample_request.model_dump(), "business_type": business_type})
-        base_rate = agent._calculate_base_rate(request)
-        assert base_rate == expected_rate * (request.annual_revenue / 1000)
+    premiums = score_premiums(requests)
+    
+    assert premiums.shape == (len(requests),)
+    for request, premium in zip(requests, premiums):
+        assert premium == pytest.approx(agent._calculate_premium(request)[0])
 
-def test_calculate_adjustment_factor(agent, sample_request, sample_risk_evaluation):
+@pytest.mark.parametrize("risk_profile,expected_factor", [
+    ("low", 0.8),
+    ("medium", 1.0),
+    ("high", 1.5)
+])
+def test_calculate_adjustment_factor(agent, sample_request, sample_risk_evaluation,
+                                     risk_profile, expected_factor):
     """Test adjustment factor calculation."""
-    # Test different risk profiles
-    test_cases = [
-        ("low", 0.8),
-        ("medium", 1.0),
-        ("high", 1.5)
-    ]
-    
-    for risk_profile, expected_factor in test_cases:
-        analysis = {**sample_risk_evaluation, "risk_profile": risk_profile}
-        factor = agent._calculate_adjustment_factor(sample_request, analysis)
-        assert factor >= expected_factor  # Factor can be higher due to additional adjustments
+    analysis = {**sample_risk_evaluation, "risk_profile": risk_profile}
+    factor = agent._calculate_adjustment_factor(sample_request, analysis)
+    assert factor >= expected_factor  # Factor can be higher due to additional adjustments
 
-def test_generate_report(agent, sample_request, sample_risk_evaluation):
+@pytest.mark.slow
+def test_generate_report(agent, sample_request, sample_risk_evaluation, tmp_path, monkeypatch):
     """Test PDF report generation."""
+    # Reports are written under the working directory; keep them in tmp_path
+    monkeypatch.chdir(tmp_path)
+    
     # Test report generation
     report_path = agent._generate_report(sample_request, sample_risk_evaluation, 7500.00)
     
     # Verify report file
-    assert os.path.exists(report_path)
+    assert (tmp_path / report_path).exists()
     assert report_path.endswith('.pdf')
+
+@pytest.mark.slow
+def test_generate_report_async(agent, sample_request, sample_risk_evaluation, tmp_path, monkeypatch):
+    """Test rendering a PDF report through the worker pool, including after shutdown."""
+    monkeypatch.chdir(tmp_path)
+    
+    async def render():
+        return await agent._generate_report_async(sample_request, sample_risk_evaluation, 7500.00)
     
-    # Clean up
-    os.remove(report_path)
-    assert not os.path.exists(report_path)
+    first = asyncio.run(render())
+    # App shutdown stops the pool; later reports start a new one
+    _shutdown_pdf_pool()
+    second = asyncio.run(render())
+    
+    for report_path in (first, second):
+        assert (tmp_path / report_path).read_bytes().startswith(b"%PDF")
+    _shutdown_pdf_pool()
 
-def test_error_handling(agent, sample_request):
-    """Test error handling in various scenarios."""
-    # Test invalid API key
-    with pytest.raises(ValueError, match="ANTHROPIC_API_KEY not found"):
-        UnderwritingAgent()
+def test_report_paths_are_unique_per_quote(agent, sample_request, sample_risk_evaluation):
+    """Test that quotes generated in the same second get separate report files."""
+    now = datetime.now()
+    paths = {
+        agent._report_args(sample_request, sample_risk_evaluation, 7500.00,
+                           generated_at=now, report_id=report_id)[0]
+        for report_id in ("first", "second", None, None)
+    }
+    assert len(paths) == 4
+
+def test_process_policy_request_reports_are_unique(agent, sample_request, risk_response_mock,
+                                                   fast_pdf):
+    """Test that concurrent quotes don't share a report path."""
+    agent.client.messages.create.return_value = risk_response_mock
+    
+    async def quote_many():
+        return await asyncio.gather(*(agent.process_policy_request(sample_request) for _ in range(5)))
     
+    results = asyncio.run(quote_many())
+    assert len({result['report_path'] for result in results}) == 5
+
+def test_create_message_retries_transient_errors(agent, risk_response_mock):
+    """Test that rate limits are retried and other API errors are not."""
+    request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+    rate_limited = anthropic.RateLimitError(
+        "Rate limited", response=httpx.Response(429, request=request), body=None
+    )
+    bad_request = anthropic.BadRequestError(
+        "Bad request", response=httpx.Response(400, request=request), body=None
+    )
+    with patch('auto_uw.agent.asyncio.sleep', new_callable=AsyncMock) as mock_sleep:
+        agent.client.messages.create.side_effect = [rate_limited, risk_response_mock]
+        assert asyncio.run(agent._create_message()) is risk_response_mock
+        assert mock_sleep.await_count == 1
+        
+        agent.client.messages.create.side_effect = [bad_request]
+        with pytest.raises(anthropic.BadRequestError):
+            asyncio.run(agent._create_message())
+        assert mock_sleep.await_count == 1
+
+def test_missing_api_key_raises():
+    """Test that the agent requires an API key."""
+    with patch.dict(os.environ, {}, clear=True), \
+            pytest.raises(ValueError, match="ANTHROPIC_API_KEY not found"):
+        UnderwritingAgent()
+
+def test_error_handling(agent, sample_request, sample_risk_evaluation):
+    """Test error handling in various scenarios."""
     # Test invalid JSON response
-    mock_response = Mock()
-    mock_response.content = [Mock(text="Invalid JSON")]
-    agent.client.messages.create.return_value = mock_response
+    agent.client.messages.create.return_value = SimpleNamespace(
+        content=[SimpleNamespace(type="text", text="Invalid JSON")]
+    )
     
     with pytest.raises(ValueError, match="Failed to parse Claude's response"):
-        agent.evaluate_risk(sample_request)
+        asyncio.run(agent.evaluate_risk(sample_request))
     
-    # Test file system errors
-    with patch('os.makedirs', side_effect=OSError("Permission denied")):
+    # Test file system errors; forget directories created by earlier tests
+    with patch('auto_uw.fs._ENSURED_DIRS', set()), \
+            patch('os.makedirs', side_effect=OSError("Permission denied")):
         with pytest.raises(OSError):
-            agent._generate_report(sample_request, sample_risk_evaluation, 7500.00) 
\ No newline at end of file
+            agent._generate_report(sample_request, sample_risk_evaluation, 7500.00)
+
+def test_process_request_batch(agent, sample_request, sample_request_dict, sample_risk_evaluation,
+                               fast_pdf):
+    """Test that grouped requests share one Claude call."""
+    other_request = PolicyRequest(**{**sample_request_dict, "business_name": "Other Cafe"})
+    analysis = {**sample_risk_evaluation, "recommendations": ["Install sprinklers"]}
+    agent.client.messages.create.return_value = tool_response({"analyses": [
+        {**analysis, "request_id": "2", "risk_profile": "high"},
+        {**analysis, "request_id": "1"}
+    ]})
+    
+    results = asyncio.run(agent.process_request_batch([sample_request, other_request]))
+    
+    agent.client.messages.create.assert_awaited_once()
+    call_args = agent.client.messages.create.call_args[1]
+    assert call_args['tool_choice'] == {'type': 'tool', 'name': 'report_policy_analyses'}
+    assert '<request id="2">' in call_args['messages'][0]['content'][1]['text']
+    assert [result['business_name'] for result in results] == ["Test Restaurant", "Other Cafe"]
+    assert [result['risk_profile'] for result in results] == ["medium", "high"]
+    assert call_args['timeout'] == 2 * GROUP_TIMEOUT_PER_REQUEST
+
+def test_process_request_batch_caps_group_size(agent, sample_request, sample_risk_evaluation,
+                                               fast_pdf):
+    """Test that oversized groups are split to keep each call under the timeout."""
+    analyses = [{**sample_risk_evaluation, "request_id": str(i)} for i in range(1, 9)]
+    agent.client.messages.create.return_value = tool_response({"analyses": analyses})
+    
+    results = asyncio.run(agent.process_request_batch([sample_request] * 16, k=100))
+    
+    assert agent.client.messages.create.await_count == 2
+    assert len(results) == 16
+
+def test_create_message_waits_for_rate_limiter(agent, sample_request, risk_response_mock, fast_pdf):
+    """Test that every Claude call is paced by the agent's RPM/TPM limiter."""
+    agent.rate_limiter = Mock(acquire=AsyncMock())
+    agent.client.messages.create.return_value = risk_response_mock
+    
+    asyncio.run(agent.process_policy_request(sample_request))
+    
+    agent.rate_limiter.acquire.assert_awaited_once()
+    assert agent.rate_limiter.acquire.call_args[0][0] > 0
+
+def test_create_message_works_across_event_loops(agent, risk_response_mock):
+    """Test that the request semaphore isn't tied to the first event loop."""
+    async def slow_create(**kwargs):
+        await asyncio.sleep(0.01)
+        return risk_response_mock
+    agent.client.messages.create.side_effect = slow_create
+    
+    async def contend():
+        return await asyncio.gather(*(agent._create_message() for _ in range(3)))
+    
+    # One slot forces waiters, which bind the semaphore to the loop
+    with patch('auto_uw.agent.MAX_CONCURRENT_REQUESTS', 1):
+        for _ in range(2):
+            assert asyncio.run(contend()) == [risk_response_mock] * 3
+
+def test_batch_endpoint_rejects_invalid_requests(sample_request_dict):
+    """Test that invalid bulk requests get a 422 naming the bad field."""
+    client = TestClient(app)
+    body = [sample_request_dict, {**sample_request_dict, "annual_revenue": -1}]
+    
+    response = client.post("/quote/batch", json=body)
+    
+    assert response.status_code == 422
+    assert response.json()['detail'][0]['loc'] == ['body', 1, 'annual_revenue']
+
+def test_client_per_event_loop(api_key):
+    """Test that each event loop gets its own client and connection pool."""
+    with patch('auto_uw.agent.AsyncAnthropic', anthropic.AsyncAnthropic):
+        agent = UnderwritingAgent()
+        
+        async def clients():
+            client = agent.client
+            assert agent.client is client
+            pool = client._client
+            # A pool closed by app shutdown is replaced on next use
+            await _close_http_client()
+            assert pool.is_closed and agent.client._client is not pool
+            return client, pool
+        
+        first, second = asyncio.run(clients()), asyncio.run(clients())
+    
+    assert first[0] is not second[0]
+    assert first[1] is not second[1]
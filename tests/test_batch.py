@@ -0,0 +1,201 @@
+"""
+Tests for the QuoteBatcher class and the batch quote endpoints.
+"""
+
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from types import SimpleNamespace
+from fastapi.testclient import TestClient
+from auto_uw.agent import app
+from auto_uw.batch import BATCH_MAX_RETRIES, QuoteBatcher
+from auto_uw.models import PolicyRequest
+
+class FakeBatches:
+    """Stand-in for client.messages.batches that ends batches after `polls` polls."""
+
+    def __init__(self, result_type="succeeded", polls=1):
+        self.result_type = result_type
+        self.polls = polls
+        self.created = []
+        self.retrieved = 0
+        self.create = AsyncMock(side_effect=self._create)
+        self.retrieve = AsyncMock(side_effect=self._retrieve)
+        self.results = AsyncMock(side_effect=self._results)
+
+    async def _create(self, requests):
+        self.created.append(requests)
+        return SimpleNamespace(id=str(len(self.created) - 1), processing_status="in_progress")
+
+    async def _retrieve(self, batch_id):
+        self.retrieved += 1
+        status = "ended" if self.retrieved >= self.polls else "in_progress"
+        return SimpleNamespace(id=batch_id, processing_status=status)
+
+    async def _results(self, batch_id):
+        async def entries():
+            for request in self.created[int(batch_id)]:
+                yield SimpleNamespace(custom_id=request["custom_id"], result=SimpleNamespace(
+                    type=self.result_type,
+                    message={"business_name": request["params"]["business_name"]}
+                ))
+        return entries()
+
+@pytest.fixture
+def batches():
+    """Create fake Message Batches endpoints."""
+    return FakeBatches()
+
+@pytest.fixture
+def batch_agent(batches):
+    """Create an agent whose client exposes only the fake batch endpoints."""
+    client = Mock()
+    client.with_options.return_value.messages.batches = batches
+
+    async def build_quote(quote_id, request, analysis):
+        return {"quote_id": quote_id, "business_name": analysis["business_name"]}
+
+    return SimpleNamespace(
+        client=client,
+        _analysis_params=lambda request: {"business_name": request.business_name},
+        _parse_claude_response=lambda message: message,
+        _build_quote=AsyncMock(side_effect=build_quote)
+    )
+
+@pytest.fixture
+def batcher(batch_agent):
+    """Create a batcher with a short window and no poll delay."""
+    return QuoteBatcher(batch_agent, max_batch_size=2, max_wait_ms=20, poll_interval=0)
+
+@pytest.fixture(scope="module")
+def make_request():
+    """Build policy requests that differ only by business name."""
+    def make(name):
+        return PolicyRequest(
+            business_name=name,
+            business_type="restaurant",
+            annual_revenue=500000,
+            employee_count=15,
+            state="CA",
+            city="San Francisco",
+            years_in_business=5,
+            business_description="Family-owned restaurant"
+        )
+    return make
+
+def test_batch_flushes_by_size(batcher, batches, make_request):
+    """Test that a full batch is sent without waiting for the window."""
+    async def submit():
+        return await asyncio.gather(*(batcher.submit(make_request(f"Cafe {i}")) for i in range(3)))
+
+    quotes = asyncio.run(submit())
+
+    assert [len(requests) for requests in batches.created] == [2, 1]
+    assert [quote["business_name"] for quote in quotes] == ["Cafe 0", "Cafe 1", "Cafe 2"]
+
+def test_batch_flushes_by_window(batcher, batches, make_request):
+    """Test that requests more than max_wait_ms apart go in separate batches."""
+    async def submit():
+        first = asyncio.ensure_future(batcher.submit(make_request("Cafe 0")))
+        await asyncio.sleep(0.05)
+        return [await first, await batcher.submit(make_request("Cafe 1"))]
+
+    asyncio.run(submit())
+
+    assert [len(requests) for requests in batches.created] == [1, 1]
+
+def test_batch_fans_out_by_custom_id(batcher, batches, batch_agent, make_request):
+    """Test that each result reaches the request with its custom_id."""
+    async def submit():
+        return await asyncio.gather(batcher.submit(make_request("Cafe 0")),
+                                    batcher.submit(make_request("Cafe 1")))
+
+    quotes = asyncio.run(submit())
+
+    custom_ids = [request["custom_id"] for request in batches.created[0]]
+    assert [quote["quote_id"] for quote in quotes] == custom_ids
+    assert [quote["business_name"] for quote in quotes] == ["Cafe 0", "Cafe 1"]
+    batch_agent.client.with_options.assert_called_with(max_retries=BATCH_MAX_RETRIES)
+
+def test_batch_polls_until_ended(batch_agent, make_request):
+    """Test that the batcher keeps polling while the batch is processing."""
+    batches = FakeBatches(polls=3)
+    batch_agent.client.with_options.return_value.messages.batches = batches
+    batcher = QuoteBatcher(batch_agent, max_wait_ms=0, poll_interval=0)
+
+    asyncio.run(batcher.submit(make_request("Cafe 0")))
+
+    assert batches.retrieve.await_count == 3
+
+def test_batch_fails_non_succeeded_results(batcher, batches, make_request):
+    """Test that errored or expired results fail their requests."""
+    batches.result_type = "errored"
+
+    with pytest.raises(ValueError, match="failed: errored"):
+        asyncio.run(batcher.submit(make_request("Cafe 0")))
+
+def test_batch_propagates_api_errors(batcher, batches, make_request):
+    """Test that a failed batch call fails every request in the batch."""
+    batches.create.side_effect = RuntimeError("API unavailable")
+
+    async def submit():
+        return await asyncio.gather(batcher.submit(make_request("Cafe 0")),
+                                    batcher.submit(make_request("Cafe 1")),
+                                    return_exceptions=True)
+
+    errors = asyncio.run(submit())
+
+    assert [str(error) for error in errors] == ["API unavailable"] * 2
+
+def test_close_fails_pending_requests(batcher, batches, make_request):
+    """Test that close() cancels unfinished batches instead of waiting for them."""
+    batches.polls = float("inf")
+
+    async def submit_then_close():
+        quote = asyncio.ensure_future(batcher.submit(make_request("Cafe 0")))
+        while not batches.created:
+            await asyncio.sleep(0.01)
+        await batcher.close(timeout=0.01)
+        return await asyncio.gather(quote, return_exceptions=True)
+
+    [error] = asyncio.run(asyncio.wait_for(submit_then_close(), 5))
+
+    assert isinstance(error, RuntimeError)
+    assert "closed" in str(error)
+
+def test_close_fails_collecting_requests(batch_agent, make_request):
+    """Test that close() fails requests still waiting for their batch window."""
+    batcher = QuoteBatcher(batch_agent, max_wait_ms=60_000)
+
+    async def submit_then_close():
+        quote = asyncio.ensure_future(batcher.submit(make_request("Cafe 0")))
+        await asyncio.sleep(0.01)
+        await batcher.close()
+        return await asyncio.gather(quote, return_exceptions=True)
+
+    [error] = asyncio.run(asyncio.wait_for(submit_then_close(), 5))
+
+    assert isinstance(error, RuntimeError)
+
+def test_quote_endpoint_batch_flag(batcher, make_request):
+    """Test that /quote?batch=true routes through the batcher."""
+    client = TestClient(app)
+
+    with patch('auto_uw.agent.get_batcher', return_value=batcher):
+        response = client.post("/quote?batch=true",
+                               json=make_request("Cafe 0").model_dump(mode="json"))
+
+    assert response.status_code == 200
+    assert response.json()["business_name"] == "Cafe 0"
+
+def test_batch_endpoint(batcher, batches, make_request):
+    """Test that /quote/batch returns one quote per request, in order."""
+    client = TestClient(app)
+    body = [make_request(f"Cafe {i}").model_dump(mode="json") for i in range(3)]
+
+    with patch('auto_uw.agent.get_batcher', return_value=batcher):
+        response = client.post("/quote/batch", json=body)
+
+    assert response.status_code == 200
+    assert [quote["business_name"] for quote in response.json()] == ["Cafe 0", "Cafe 1", "Cafe 2"]
+    assert sum(len(requests) for requests in batches.created) == 3
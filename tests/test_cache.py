@@ -0,0 +1,95 @@
+"""
+Tests for the AnalysisCache class.
+"""
+
+import asyncio
+import pytest
+from unittest.mock import patch
+from auto_uw.cache import AnalysisCache
+
+@pytest.fixture
+def cache(tmp_path):
+    """Create a cache in a temporary directory."""
+    return AnalysisCache(tmp_path)
+
+@pytest.fixture(scope="module")
+def analysis():
+    """Create a sample analysis."""
+    return {"risk_profile": "medium", "risk_score": 65}
+
+def test_set_and_get(cache, tmp_path, analysis):
+    """Test that analyses are served from memory and from disk."""
+    asyncio.run(cache.set("key", analysis))
+    
+    assert asyncio.run(cache.get("key")) == analysis
+    assert asyncio.run(AnalysisCache(tmp_path).get("key")) == analysis
+    assert asyncio.run(cache.get("missing")) is None
+    
+    # Entries are renamed into place, leaving no temporary files
+    assert [path.name for path in tmp_path.iterdir()] == ["key.json"]
+
+def test_failed_write_keeps_previous_entry(cache, tmp_path, analysis, capsys):
+    """Test that a failed write is reported, cleaned up and leaves the old entry readable."""
+    asyncio.run(cache.set("key", analysis))
+    
+    with patch('auto_uw.cache.aiofiles.os.replace', side_effect=OSError("Disk full")):
+        asyncio.run(cache.set("key", {"risk_profile": "high"}))
+    
+    assert "Disk full" in capsys.readouterr().out
+    assert [path.name for path in tmp_path.iterdir()] == ["key.json"]
+    assert asyncio.run(AnalysisCache(tmp_path).get("key")) == analysis
+    # The paid-for analysis is still served from memory
+    assert asyncio.run(cache.get("key")) == {"risk_profile": "high"}
+
+def test_unusable_cache_dir_is_a_miss(tmp_path, analysis, capsys):
+    """Test that cache directory errors never fail the caller."""
+    blocker = tmp_path / "blocker"
+    blocker.write_text("")
+    cache = AnalysisCache(blocker / "analyses")
+    
+    asyncio.run(cache.set("key", analysis))
+    assert "Error writing cache entry" in capsys.readouterr().out
+    
+    (tmp_path / "dir.json").mkdir()
+    assert asyncio.run(AnalysisCache(tmp_path).get("dir")) is None
+
+def test_corrupt_entry_is_a_miss(cache, tmp_path):
+    """Test that unreadable cache files are treated as misses."""
+    (tmp_path / "key.json").write_text("invalid json")
+    (tmp_path / "old.json").write_text('{"risk_profile": "medium"}')
+    
+    assert asyncio.run(cache.get("key")) is None
+    assert asyncio.run(cache.get("old")) is None
+
+def test_memory_is_bounded(tmp_path, analysis):
+    """Test that the least recently used entries are evicted from memory."""
+    cache = AnalysisCache(tmp_path, max_entries=2)
+    for key in ("a", "b"):
+        asyncio.run(cache.set(key, analysis))
+    asyncio.run(cache.get("a"))
+    asyncio.run(cache.set("c", analysis))
+    
+    assert list(cache._memory) == ["a", "c"]
+    # Evicted entries are still on disk
+    assert asyncio.run(cache.get("b")) == analysis
+
+def test_entries_expire(tmp_path, analysis):
+    """Test that entries older than the TTL are misses, in memory and on disk."""
+    cache = AnalysisCache(tmp_path, ttl=60)
+    with patch('auto_uw.cache.time.time', return_value=1000.0):
+        asyncio.run(cache.set("key", analysis))
+    
+    with patch('auto_uw.cache.time.time', return_value=1030.0):
+        assert asyncio.run(cache.get("key")) == analysis
+    with patch('auto_uw.cache.time.time', return_value=1100.0):
+        assert asyncio.run(cache.get("key")) is None
+        assert asyncio.run(AnalysisCache(tmp_path, ttl=60).get("key")) is None
+
+def test_key_includes_cache_version():
+    """Test that bumping the cache version invalidates every key."""
+    params = {"model": "claude", "messages": []}
+    key = AnalysisCache.key(params)
+    assert key == AnalysisCache.key(dict(reversed(params.items())))
+    
+    with patch('auto_uw.cache.CACHE_VERSION', -1):
+        assert AnalysisCache.key(params) != key
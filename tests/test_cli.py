@@ -2,18 +2,30 @@
 
 import os
 import json
+import errno
+import asyncio
+import click
 import pytest
-from unittest.mock import patch, Mock
+from unittest.mock import AsyncMock, patch, Mock
 from click.testing import CliRunner
-from auto_uw.cli import cli
+from auto_uw.cli import cli, quote, write_direct
 from auto_uw.models import PolicyRequest, Claim
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def runner():
     """Create a CLI runner."""
     return CliRunner()
 
-@pytest.fixture
+@pytest.fixture(autouse=True)
+def mock_cli_agent():
+    """Mock the CLI's UnderwritingAgent and yield the instance commands use."""
+    with patch('auto_uw.cli.UnderwritingAgent') as mock_agent:
+        # Commands await these through asyncio.run, so they must return coroutines
+        instance = Mock(process_policy_request=AsyncMock(), process_request_batch=AsyncMock())
+        mock_agent.return_value = instance
+        yield instance
+
+@pytest.fixture(scope="session")
 def sample_request_data():
     """Create sample request data."""
     return {
@@ -34,6 +46,46 @@ def sample_request_data():
         ]
     }
 
+@pytest.fixture(scope="session")
+def claims_file(tmp_path_factory, sample_request_data):
+    """Write the sample claims history to a file once."""
+    claims_file = tmp_path_factory.mktemp("claims") / 'claims.json'
+    claims_file.write_text(json.dumps(sample_request_data['claims_history']))
+    return claims_file
+
+@pytest.fixture(scope="session")
+def quote_argv(sample_request_data, claims_file):
+    """Build the quote command's arguments for the sample request, minus --output."""
+    return [
+        'quote',
+        '--business-name', sample_request_data['business_name'],
+        '--business-type', sample_request_data['business_type'],
+        '--annual-revenue', str(sample_request_data['annual_revenue']),
+        '--employee-count', str(sample_request_data['employee_count']),
+        '--state', sample_request_data['state'],
+        '--city', sample_request_data['city'],
+        '--years-in-business', str(sample_request_data['years_in_business']),
+        '--business-description', sample_request_data['business_description'],
+        '--claims', str(claims_file)
+    ]
+
+@pytest.fixture(scope="session")
+def quote_kwargs(sample_request_data):
+    """Build keyword arguments for calling the quote command's callback directly."""
+    return {
+        'business_name': sample_request_data['business_name'],
+        'business_type': sample_request_data['business_type'],
+        'annual_revenue': sample_request_data['annual_revenue'],
+        'employee_count': sample_request_data['employee_count'],
+        'state': sample_request_data['state'],
+        'city': sample_request_data['city'],
+        'years_in_business': sample_request_data['years_in_business'],
+        'business_description': sample_request_data['business_description'],
+        'claims': None,
+        'output': None,
+        'cache': False
+    }
+
 @pytest.fixture
 def sample_quote_response():
     """Create a sample quote response."""
@@ -51,151 +103,150 @@ def sample_quote_response():
         "timestamp": "2024-03-22T22:56:04.123456"
     }
 
-def test_quote_command(runner, sample_request_data, sample_quote_response):
+def test_quote_command(runner, tmp_path, api_key, mock_cli_agent, quote_argv,
+                       sample_request_data, sample_quote_response):
     """Test the quote command."""
-    with patch('auto_uw.cli.UnderwritingAgent') as mock_agent:
-        # Configure mock
-        mock_instance = Mock()
-        mock_instance.process_policy_request.return_value = sample_quote_response
-        mock_agent.return_value = mock_instance
-        
-        # Run command
-        result = runner.invoke(cli, [
-            'quote',
-            '--business-name', sample_request_data['business_name'],
-            '--business-type', sample_request_data['business_type'],
-            '--revenue', str(sample_request_data['annual_revenue']),
-            '--employees', str(sample_request_data['employee_count']),
-            '--state', sample_request_data['state'],
-            '--city', sample_request_data['city'],
-            '--years', str(sample_request_data['years_in_business']),
-            '--description', sample_request_data['business_description'],
-            '--claims', json.dumps(sample_request_data['claims_history']),
-            '--output', 'quote.json'
-        ])
-        
-        # Verify command execution
-        assert result.exit_code == 0
-        assert "Quote generated successfully" in result.output
-        
-        # Verify output file
-        assert os.path.exists('quote.json')
-        with open('quote.json', 'r') as f:
-            output_data = json.load(f)
-            assert output_data == sample_quote_response
-        
-        # Clean up
-        os.remove('quote.json')
-        assert not os.path.exists('quote.json')
-
-def test_batch_quote_command(runner, sample_request_data, sample_quote_response):
+    output_file = tmp_path / 'quote.json'
+    mock_cli_agent.process_policy_request.return_value = sample_quote_response
+    
+    # Run command
+    result = runner.invoke(cli, [*quote_argv, '--output', str(output_file)])
+    
+    # Verify command execution
+    assert result.exit_code == 0, result.output
+    assert f"Quote saved to {output_file}" in result.output
+    request = mock_cli_agent.process_policy_request.call_args[0][0]
+    assert request.claims_history[0].amount == sample_request_data['claims_history'][0]['amount']
+    
+    # Verify output file
+    assert output_file.exists()
+    output_data = json.loads(output_file.read_text())
+    assert output_data == sample_quote_response
+
+@pytest.mark.slow
+def test_batch_quote_command(runner, tmp_path, api_key, mock_cli_agent, sample_request_data,
+                             sample_quote_response):
     """Test the batch-quote command."""
     # Create input file
-    input_data = [sample_request_data]
-    with open('quotes.json', 'w') as f:
-        json.dump(input_data, f)
+    input_file = tmp_path / 'quotes.json'
+    output_dir = tmp_path / 'results'
+    input_file.write_text(json.dumps([sample_request_data]))
+    mock_cli_agent.process_policy_request.return_value = sample_quote_response
     
-    with patch('auto_uw.cli.UnderwritingAgent') as mock_agent:
-        # Configure mock
-        mock_instance = Mock()
-        mock_instance.process_policy_request.return_value = sample_quote_response
-        mock_agent.return_value = mock_instance
-        
-        # Run command
-        result = runner.invoke(cli, [
-            'batch-quote',
-            '--input', 'quotes.json',
-            '--output', 'results.json'
-        ])
-        
-        # Verify command execution
-        assert result.exit_code == 0
-        assert "Batch processing completed" in result.output
-        
-        # Verify output file
-        assert os.path.exists('results.json')
-        with open('results.json', 'r') as f:
-            output_data = json.load(f)
-            assert len(output_data) == 1
-            assert output_data[0] == sample_quote_response
-        
-        # Clean up
-        os.remove('quotes.json')
-        os.remove('results.json')
-        assert not os.path.exists('quotes.json')
-        assert not os.path.exists('results.json')
-
-def test_missing_required_fields(runner):
-    """Test handling of missing required fields."""
-    # Run command with missing fields
+    # Run command
     result = runner.invoke(cli, [
-        'quote',
-        '--business-name', 'Test Restaurant',
-        '--output', 'quote.json'
+        'batch-quote', str(input_file),
+        '--output-dir', str(output_dir)
     ])
     
-    # Verify error handling
-    assert result.exit_code != 0
-    assert "Missing required fields" in result.output
+    # Verify command execution
+    output_file = output_dir / 'quote_test_restaurant_1.json'
+    assert result.exit_code == 0, result.output
+    assert f"Quote saved to {output_file}" in result.output
+    
+    # Verify output file
+    assert json.loads(output_file.read_text()) == sample_quote_response
 
-def test_invalid_json(runner):
-    """Test handling of invalid JSON input."""
-    # Run command with invalid JSON
+def test_serve_command(runner, api_key, mock_cli_agent, sample_request_data):
+    """Test that serve writes one result per input line, in input order, until EOF."""
+    async def slow_quote(request):
+        # The first request finishes last
+        await asyncio.sleep(0.05 if request.business_name == "First" else 0)
+        return {"business_name": request.business_name}
+    mock_cli_agent.process_policy_request.side_effect = slow_quote
+    lines = [json.dumps({**sample_request_data, "business_name": name}) for name in ("First", "Second")]
+    
+    result = runner.invoke(cli, ['serve', '--concurrency', '2'], input="\n".join([*lines, "", ""]))
+    
+    assert result.exit_code == 0, result.output
+    assert [json.loads(line) for line in result.output.splitlines()] == [
+        {"business_name": "First"}, {"business_name": "Second"}
+    ]
+
+def test_serve_reports_invalid_lines(runner, api_key, mock_cli_agent, sample_request_data):
+    """Test that invalid lines produce error records without stopping the server."""
+    mock_cli_agent.process_policy_request.return_value = {"quote_id": "test-id"}
+    lines = ["not json", json.dumps({"business_name": "Missing Fields"}), json.dumps(sample_request_data)]
+    
+    result = runner.invoke(cli, ['serve'], input="\n".join(lines) + "\n")
+    
+    assert result.exit_code == 0, result.output
+    records = [json.loads(line) for line in result.output.splitlines()]
+    assert len(records) == 3
+    assert "error" in records[0]
+    assert "business_type" in records[1]["error"]
+    assert records[2] == {"quote_id": "test-id"}
+    mock_cli_agent.process_policy_request.assert_awaited_once()
+
+def test_missing_required_fields(runner, tmp_path):
+    """Test handling of missing required fields."""
+    # Run command with missing fields, letting click's error propagate
     result = runner.invoke(cli, [
         'quote',
         '--business-name', 'Test Restaurant',
-        '--business-type', 'restaurant',
-        '--revenue', '500000',
-        '--employees', '15',
-        '--state', 'CA',
-        '--city', 'San Francisco',
-        '--years', '5',
-        '--description', 'Test description',
-        '--claims', 'invalid json',
-        '--output', 'quote.json'
-    ])
+        '--output', str(tmp_path / 'quote.json')
+    ], standalone_mode=False)
     
     # Verify error handling
-    assert result.exit_code != 0
-    assert "Invalid JSON format" in result.output
+    assert isinstance(result.exception, click.MissingParameter)
 
-def test_file_permission_errors(runner, sample_request_data):
+def test_invalid_json(tmp_path, quote_kwargs):
+    """Test handling of invalid JSON input."""
+    claims_file = tmp_path / 'claims.json'
+    claims_file.write_text('invalid json')
+    
+    # Call the command directly; argument parsing isn't under test here
+    with patch.dict(os.environ, {'ANTHROPIC_API_KEY': 'test_key'}):
+        with pytest.raises(click.ClickException, match="Invalid JSON"):
+            quote.callback(**{**quote_kwargs, 'claims': claims_file, 'output': tmp_path / 'quote.json'})
+
+def test_file_permission_errors(tmp_path, mock_cli_agent, quote_kwargs):
     """Test handling of file permission errors."""
-    with patch('auto_uw.cli.UnderwritingAgent') as mock_agent:
-        # Configure mock
-        mock_instance = Mock()
-        mock_instance.process_policy_request.return_value = {
-            "quote_id": "test-id",
-            "report_path": "reports/test.pdf"
-        }
-        mock_agent.return_value = mock_instance
-        
-        # Mock file operations to raise permission errors
-        with patch('builtins.open', side_effect=PermissionError):
-            result = runner.invoke(cli, [
-                'quote',
-                '--business-name', sample_request_data['business_name'],
-                '--business-type', sample_request_data['business_type'],
-                '--revenue', str(sample_request_data['annual_revenue']),
-                '--employees', str(sample_request_data['employee_count']),
-                '--state', sample_request_data['state'],
-                '--city', sample_request_data['city'],
-                '--years', str(sample_request_data['years_in_business']),
-                '--description', sample_request_data['business_description'],
-                '--claims', json.dumps(sample_request_data['claims_history']),
-                '--output', 'quote.json'
-            ])
-            
-            # Verify error handling
-            assert result.exit_code != 0
-            assert "Permission denied" in result.output
-
-def test_api_key_validation(runner):
-    """Test API key validation."""
+    mock_cli_agent.process_policy_request.return_value = {
+        "quote_id": "test-id",
+        "report_path": "reports/test.pdf"
+    }
+    
+    # Mock file writes to raise permission errors
+    with patch.dict(os.environ, {'ANTHROPIC_API_KEY': 'test_key'}), \
+            patch('pathlib.Path.write_bytes', side_effect=PermissionError("Permission denied")):
+        with pytest.raises(click.ClickException, match="Permission denied"):
+            quote.callback(**{**quote_kwargs, 'output': tmp_path / 'quote.json'})
+
+def test_api_key_validation(runner, tmp_path, mock_cli_agent, quote_argv):
+    """Test that commands fail with a usage message when no API key is set."""
     # Remove API key from environment
     with patch.dict(os.environ, {}, clear=True):
-        result = runner.invoke(cli, ['quote', '--help'])
-        
-        # Verify error handling
-        assert result.exit_code != 0
-        assert "ANTHROPIC_API_KEY not found" in result.output 
\ No newline at end of file
+        result = runner.invoke(cli, [*quote_argv, '--output', str(tmp_path / 'quote.json')])
+    
+    assert result.exit_code == 1
+    assert "ANTHROPIC_API_KEY environment variable not set" in result.output
+    mock_cli_agent.process_policy_request.assert_not_called() 
+
+def test_write_direct_handles_short_writes(tmp_path):
+    """Test that O_DIRECT writes continue until the whole buffer is written."""
+    payload = b"x" * 10000
+    real_write = os.write
+    
+    def write_one_page(fd, data):
+        return real_write(fd, data[:4096])
+    
+    # Run the direct path on any filesystem, with one page per write call
+    with patch('auto_uw.cli.os.O_DIRECT', 0, create=True), \
+            patch('auto_uw.cli.os.write', side_effect=write_one_page) as mock_write:
+        write_direct(tmp_path / 'quote.json', payload)
+    
+    assert mock_write.call_count == 3
+    assert (tmp_path / 'quote.json').read_bytes() == payload
+
+@pytest.mark.parametrize("failing_call", ["open", "write"])
+def test_write_direct_falls_back_on_einval(tmp_path, failing_call):
+    """Test that filesystems rejecting O_DIRECT get a buffered write."""
+    payload = b'{"quote_id": "test-id"}'
+    error = OSError(errno.EINVAL, "Invalid argument")
+    
+    with patch('auto_uw.cli.os.O_DIRECT', 0, create=True), \
+            patch(f'auto_uw.cli.os.{failing_call}', side_effect=error):
+        write_direct(tmp_path / 'quote.json', payload)
+    
+    assert (tmp_path / 'quote.json').read_bytes() == payload
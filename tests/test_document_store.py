@@ -2,24 +2,26 @@
 
 import os
 import json
+import mmap
+import tempfile
 import pytest
-from unittest.mock import patch, Mock
+from pathlib import Path
+from unittest.mock import patch
+from pyfakefs.fake_filesystem_unittest import Pause
 from auto_uw.document_store import DocumentStore
 from auto_uw.models import Document
 
 @pytest.fixture
-def temp_docs_dir(tmp_path):
-    """Create a temporary directory for test documents."""
-    docs_dir = tmp_path / "test_docs"
-    docs_dir.mkdir()
-    return docs_dir
+def temp_docs_dir(fs_module, request):
+    """Create a directory for one test's documents on the module's in-memory filesystem."""
+    return Path(fs_module.create_dir(f"/test_docs/{request.node.name}").path)
 
 @pytest.fixture
 def document_store(temp_docs_dir):
     """Create a DocumentStore instance with test directory."""
     return DocumentStore(docs_dir=str(temp_docs_dir))
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_document():
     """Create a sample document."""
     return Document(
@@ -30,162 +32,282 @@ def sample_document():
         metadata={
             "business_type": "restaurant",
             "version": "1.0",
-            "last_updated": "2024-03-22"
+            "applicable_states": ["CA"]
         }
     )
 
+@pytest.fixture(scope="module")
+def other_document():
+    """Create a second sample document that doesn't match the sample's searches."""
+    return Document(
+        doc_id="test_doc_002",
+        title="Another Document",
+        content="This is another sample document.",
+        doc_type="policy",
+        metadata={"business_type": "retail"}
+    )
+
+def add_sample(store, doc):
+    """Add a sample Document to a store, recording its type in the metadata."""
+    store.add_document(
+        doc_id=doc.doc_id,
+        title=doc.title,
+        content=doc.content,
+        metadata={**doc.metadata, "type": doc.doc_type}
+    )
+
+@pytest.fixture(scope="module")
+def populated_document_store(fs_module, sample_document, other_document):
+    """Create a DocumentStore holding both sample documents, shared by read-only tests."""
+    store = DocumentStore(docs_dir="/populated_docs")
+    add_sample(store, sample_document)
+    add_sample(store, other_document)
+    return store
+
 def test_document_store_initialization(document_store, temp_docs_dir):
     """Test DocumentStore initialization."""
-    assert document_store.docs_dir == str(temp_docs_dir)
+    assert document_store.docs_dir == temp_docs_dir
     assert os.path.exists(document_store.docs_dir)
+    assert document_store.list_documents() == []
 
 def test_add_document(document_store, sample_document):
     """Test adding a document."""
     # Add document
-    document_store.add_document(
-        doc_id=sample_document.doc_id,
-        title=sample_document.title,
-        content=sample_document.content,
-        doc_type=sample_document.doc_type,
-        metadata=sample_document.metadata
-    )
+    add_sample(document_store, sample_document)
     
-    # Verify document was saved
-    doc_path = os.path.join(document_store.docs_dir, f"{sample_document.doc_id}.json")
-    assert os.path.exists(doc_path)
+    # Verify document was saved, with no temporary file left behind
+    doc_path = document_store.docs_dir / f"{sample_document.doc_id}.json"
+    assert os.listdir(document_store.docs_dir) == [doc_path.name]
     
     # Verify document contents
-    with open(doc_path, 'r') as f:
-        saved_doc = json.load(f)
-        assert saved_doc['doc_id'] == sample_document.doc_id
-        assert saved_doc['title'] == sample_document.title
-        assert saved_doc['content'] == sample_document.content
-        assert saved_doc['doc_type'] == sample_document.doc_type
-        assert saved_doc['metadata'] == sample_document.metadata
-
-def test_get_document(document_store, sample_document):
+    saved_doc = json.loads(doc_path.read_text())
+    assert saved_doc['id'] == sample_document.doc_id
+    assert saved_doc['title'] == sample_document.title
+    assert saved_doc['content'] == sample_document.content
+    assert saved_doc['type'] == sample_document.doc_type
+    assert saved_doc['applicable_states'] == ["CA"]
+    assert saved_doc['metadata']['business_type'] == "restaurant"
+    assert saved_doc == document_store.get_document(sample_document.doc_id)
+
+def test_add_document_validation(document_store):
+    """Test that incomplete documents are rejected."""
+    with pytest.raises(ValueError, match="ID cannot be empty"):
+        document_store.add_document("", "Title", "Content", {})
+    with pytest.raises(ValueError, match="content cannot be empty"):
+        document_store.add_document("doc", "Title", "", {})
+    with pytest.raises(ValueError, match="Metadata must be a dictionary"):
+        document_store.add_document("doc", "Title", "Content", None)
+
+def test_get_document(populated_document_store, sample_document):
     """Test retrieving a document."""
-    # Add document first
-    document_store.add_document(
-        doc_id=sample_document.doc_id,
-        title=sample_document.title,
-        content=sample_document.content,
-        doc_type=sample_document.doc_type,
-        metadata=sample_document.metadata
-    )
-    
     # Retrieve document
-    retrieved_doc = document_store.get_document(sample_document.doc_id)
+    retrieved_doc = populated_document_store.get_document(sample_document.doc_id)
     
     # Verify document contents
-    assert retrieved_doc.doc_id == sample_document.doc_id
-    assert retrieved_doc.title == sample_document.title
-    assert retrieved_doc.content == sample_document.content
-    assert retrieved_doc.doc_type == sample_document.doc_type
-    assert retrieved_doc.metadata == sample_document.metadata
+    assert retrieved_doc['id'] == sample_document.doc_id
+    assert retrieved_doc['title'] == sample_document.title
+    assert retrieved_doc['content'] == sample_document.content
+    assert retrieved_doc['type'] == sample_document.doc_type
+    assert retrieved_doc['metadata'] == {**sample_document.metadata, "type": sample_document.doc_type}
 
-def test_list_documents(document_store, sample_document):
+def test_list_documents(populated_document_store, sample_document, other_document):
     """Test listing documents."""
-    # Add multiple documents
-    docs = [
-        sample_document,
-        Document(
-            doc_id="test_doc_002",
-            title="Another Document",
-            content="This is another test document.",
-            doc_type="guideline",
-            metadata={"business_type": "retail"}
-        )
-    ]
-    
-    for doc in docs:
-        document_store.add_document(
-            doc_id=doc.doc_id,
-            title=doc.title,
-            content=doc.content,
-            doc_type=doc.doc_type,
-            metadata=doc.metadata
-        )
+    docs = [sample_document, other_document]
     
     # List documents
-    doc_list = document_store.list_documents()
+    doc_list = populated_document_store.list_documents()
     
-    # Verify list contents
-    assert len(doc_list) == 2
-    doc_ids = {doc.doc_id for doc in doc_list}
-    assert doc_ids == {doc.doc_id for doc in docs}
+    # Verify list contents, in insertion order
+    assert [doc['id'] for doc in doc_list] == [doc.doc_id for doc in docs]
 
-def test_search_documents(document_store, sample_document):
+def test_search_documents(populated_document_store, sample_document):
     """Test searching documents."""
-    # Add document
-    document_store.add_document(
-        doc_id=sample_document.doc_id,
-        title=sample_document.title,
-        content=sample_document.content,
-        doc_type=sample_document.doc_type,
-        metadata=sample_document.metadata
-    )
-    
-    # Search by content
-    results = document_store.search_documents("test document")
-    assert len(results) == 1
-    assert results[0].doc_id == sample_document.doc_id
+    # Search by content, ignoring case
+    results = populated_document_store.search_documents("Test Document")
+    assert [doc['id'] for doc in results] == [sample_document.doc_id]
     
     # Search by metadata
-    results = document_store.search_documents("restaurant", search_metadata=True)
-    assert len(results) == 1
-    assert results[0].doc_id == sample_document.doc_id
+    results = populated_document_store.search_documents("restaurant", search_metadata=True)
+    assert [doc['id'] for doc in results] == [sample_document.doc_id]
+    assert populated_document_store.search_documents("restaurant") == []
     
     # Search with no results
-    results = document_store.search_documents("nonexistent")
+    results = populated_document_store.search_documents("nonexistent")
     assert len(results) == 0
 
+def test_search_documents_matches_each_document_once(populated_document_store):
+    """Test that corpus search reports each matching document once, in store order."""
+    results = populated_document_store.search_documents("document")
+    assert [doc['id'] for doc in results] == ["test_doc_001", "test_doc_002"]
+    
+    # Matches can't span two documents' contents
+    assert populated_document_store.search_documents("document.this") == []
+    assert populated_document_store.semantic_search("another") == ["This is another sample document."]
+
+def test_search_sees_changes(document_store, sample_document, other_document):
+    """Test that the search corpus is rebuilt after documents change."""
+    add_sample(document_store, sample_document)
+    assert document_store.search_documents("another") == []
+    
+    add_sample(document_store, other_document)
+    assert [doc['id'] for doc in document_store.search_documents("another")] == [other_document.doc_id]
+    
+    document_store.update_document(other_document.doc_id, content="Replaced content")
+    assert document_store.search_documents("another") == []
+    assert len(document_store.search_documents("replaced")) == 1
+    
+    document_store.delete_document(other_document.doc_id)
+    assert document_store.search_documents("replaced") == []
+
+def test_documents_by_type_and_state(populated_document_store, sample_document, other_document):
+    """Test the type and state indices."""
+    store = populated_document_store
+    assert [doc['id'] for doc in store.get_documents_by_type("guideline")] == [sample_document.doc_id]
+    assert [doc['id'] for doc in store.get_documents_by_type("policy")] == [other_document.doc_id]
+    assert store.get_documents_by_type("missing") == []
+    
+    # Documents without applicable_states apply to every state
+    assert [doc['id'] for doc in store.get_documents_by_state("CA")] == [
+        sample_document.doc_id, other_document.doc_id
+    ]
+    assert [doc['id'] for doc in store.get_documents_by_state("NY")] == [other_document.doc_id]
+
+def test_indices_follow_updates(document_store, sample_document):
+    """Test that updates and deletes move documents between indices."""
+    add_sample(document_store, sample_document)
+    document_store.update_document(sample_document.doc_id, type="policy", applicable_states=["NY"])
+    
+    assert document_store.get_documents_by_type("guideline") == []
+    assert len(document_store.get_documents_by_type("policy")) == 1
+    assert document_store.get_documents_by_state("CA") == []
+    assert len(document_store.get_documents_by_state("NY")) == 1
+    
+    document_store.delete_document(sample_document.doc_id)
+    assert document_store.get_documents_by_type("policy") == []
+    assert document_store.get_documents_by_state("NY") == []
+
 def test_update_document(document_store, sample_document):
     """Test updating a document."""
     # Add document first
-    document_store.add_document(
-        doc_id=sample_document.doc_id,
-        title=sample_document.title,
-        content=sample_document.content,
-        doc_type=sample_document.doc_type,
-        metadata=sample_document.metadata
-    )
+    add_sample(document_store, sample_document)
+    last_updated = document_store.get_document(sample_document.doc_id)['last_updated']
     
     # Update document
     new_content = "Updated content"
     document_store.update_document(
         doc_id=sample_document.doc_id,
-        content=new_content
+        content=new_content,
+        unknown_field="ignored"
     )
     
     # Verify update
     updated_doc = document_store.get_document(sample_document.doc_id)
-    assert updated_doc.content == new_content
-    assert updated_doc.title == sample_document.title  # Unchanged
+    assert updated_doc['content'] == new_content
+    assert updated_doc['title'] == sample_document.title  # Unchanged
+    assert updated_doc['last_updated'] > last_updated
+    assert 'unknown_field' not in updated_doc
+    
+    # Verify the update was saved
+    doc_path = document_store.docs_dir / f"{sample_document.doc_id}.json"
+    assert json.loads(doc_path.read_text())['content'] == new_content
+
+def test_write_is_atomic(document_store, sample_document):
+    """Test that a failed save leaves the previous document file intact."""
+    add_sample(document_store, sample_document)
+    doc_path = document_store.docs_dir / f"{sample_document.doc_id}.json"
+    original = doc_path.read_bytes()
+    
+    with patch('auto_uw.document_store.os.replace', side_effect=OSError("Disk full")):
+        with pytest.raises(OSError, match="Disk full"):
+            document_store.update_document(sample_document.doc_id, content="Partial")
+    
+    assert doc_path.read_bytes() == original
+    
+    # A leftover temporary file isn't loaded as a document
+    assert [doc['content'] for doc in DocumentStore(str(document_store.docs_dir)).list_documents()] == [
+        sample_document.content
+    ]
+
+def test_failed_update_leaves_store_unchanged(document_store, sample_document):
+    """Test that a failed save doesn't change the document in memory or its indices."""
+    add_sample(document_store, sample_document)
+    original = dict(document_store.get_document(sample_document.doc_id))
+    
+    with patch('auto_uw.document_store.os.replace', side_effect=OSError("Disk full")):
+        with pytest.raises(OSError):
+            document_store.update_document(sample_document.doc_id, content="Partial", type="policy")
+    
+    assert document_store.get_document(sample_document.doc_id) == original
+    assert len(document_store.get_documents_by_type("guideline")) == 1
+    assert document_store.get_documents_by_type("policy") == []
+    assert len(document_store.get_documents_by_state("CA")) == 1
+    assert document_store.search_documents("partial") == []
+    assert len(document_store.search_documents("restaurant", search_metadata=True)) == 1
 
 def test_delete_document(document_store, sample_document):
     """Test deleting a document."""
     # Add document first
-    document_store.add_document(
-        doc_id=sample_document.doc_id,
-        title=sample_document.title,
-        content=sample_document.content,
-        doc_type=sample_document.doc_type,
-        metadata=sample_document.metadata
-    )
+    add_sample(document_store, sample_document)
     
     # Delete document
     document_store.delete_document(sample_document.doc_id)
     
     # Verify deletion
-    doc_path = os.path.join(document_store.docs_dir, f"{sample_document.doc_id}.json")
+    doc_path = document_store.docs_dir / f"{sample_document.doc_id}.json"
     assert not os.path.exists(doc_path)
     
     # Verify document is not retrievable
     with pytest.raises(FileNotFoundError):
         document_store.get_document(sample_document.doc_id)
 
-def test_error_handling(document_store):
+def test_load_documents(document_store, sample_document, other_document):
+    """Test that a new store loads saved documents and their indices."""
+    add_sample(document_store, sample_document)
+    add_sample(document_store, other_document)
+    
+    reloaded = DocumentStore(str(document_store.docs_dir))
+    
+    assert {doc['id'] for doc in reloaded.list_documents()} == {sample_document.doc_id, other_document.doc_id}
+    assert reloaded.get_document(sample_document.doc_id) == document_store.get_document(sample_document.doc_id)
+    assert len(reloaded.get_documents_by_type("guideline")) == 1
+    assert len(reloaded.search_documents("another")) == 1
+
+def test_load_documents_without_metadata(temp_docs_dir):
+    """Test that documents saved without metadata load and can be searched."""
+    doc = {"id": "bare", "title": "Bare Document", "content": "No metadata here"}
+    (temp_docs_dir / "bare.json").write_text(json.dumps(doc))
+    
+    store = DocumentStore(str(temp_docs_dir))
+    
+    assert store.get_document("bare") == doc
+    assert [found['id'] for found in store.search_documents("metadata", search_metadata=True)] == ["bare"]
+    store.update_document("bare", content="Updated")
+    assert store.get_document("bare")['content'] == "Updated"
+
+def test_load_documents_in_parallel(document_store):
+    """Test loading a store large enough to read through the thread pool."""
+    for i in range(10):
+        document_store.add_document(f"doc_{i}", f"Document {i}", f"Content {i}", {})
+    
+    with patch('auto_uw.document_store._PARALLEL_LOAD_THRESHOLD', 1), \
+            patch('auto_uw.document_store._LOAD_CHUNK_SIZE', 3):
+        reloaded = DocumentStore(str(document_store.docs_dir))
+    
+    assert sorted(reloaded.documents) == sorted(document_store.documents)
+
+def test_load_large_documents(fs_module, sample_document):
+    """Test that documents over the mmap threshold are parsed from a memory map."""
+    # mmap needs real file descriptors, so use the real filesystem
+    with Pause(fs_module), tempfile.TemporaryDirectory() as docs_dir:
+        add_sample(DocumentStore(docs_dir), sample_document)
+        with patch('auto_uw.document_store._MMAP_THRESHOLD', 0), \
+                patch('auto_uw.document_store.mmap.mmap', wraps=mmap.mmap) as mock_mmap:
+            reloaded = DocumentStore(docs_dir)
+    
+    mock_mmap.assert_called_once()
+    assert reloaded.get_document(sample_document.doc_id)['content'] == sample_document.content
+
+def test_error_handling(document_store, capsys):
     """Test error handling in various scenarios."""
     # Test getting non-existent document
     with pytest.raises(FileNotFoundError):
@@ -193,20 +315,21 @@ def test_error_handling(document_store):
     
     # Test updating non-existent document
     with pytest.raises(FileNotFoundError):
-        document_store.update_document("nonexistent", "new content")
+        document_store.update_document("nonexistent", content="new content")
     
     # Test deleting non-existent document
     with pytest.raises(FileNotFoundError):
         document_store.delete_document("nonexistent")
     
-    # Test invalid JSON in document file
-    doc_path = os.path.join(document_store.docs_dir, "invalid.json")
-    with open(doc_path, 'w') as f:
-        f.write("invalid json")
+    # Test invalid JSON in document file; the store skips it when loading
+    doc_path = document_store.docs_dir / "invalid.json"
+    doc_path.write_text("invalid json")
     
-    with pytest.raises(json.JSONDecodeError):
-        document_store.get_document("invalid")
+    reloaded = DocumentStore(str(document_store.docs_dir))
+    assert reloaded.list_documents() == []
+    assert "Error loading document" in capsys.readouterr().out
 
+@pytest.mark.slow
 def test_business_type_guidelines(document_store):
     """Test business type guidelines."""
     # Add guidelines for different business types
@@ -216,16 +339,13 @@ def test_business_type_guidelines(document_store):
             doc_id=f"guideline_{business_type}",
             title=f"{business_type.title()} Guidelines",
             content=f"Guidelines for {business_type} businesses",
-            doc_type="guideline",
-            metadata={"business_type": business_type}
+            metadata={"type": "guideline", "business_type": business_type}
         )
     
     # Verify all business types have guidelines
+    assert len(document_store.get_documents_by_type("guideline")) == len(business_types)
     for business_type in business_types:
-        results = document_store.search_documents(
-            business_type,
-            search_metadata=True,
-            doc_type="guideline"
-        )
+        results = document_store.search_documents(f'"business_type": "{business_type}"',
+                                                  search_metadata=True)
         assert len(results) == 1
-        assert results[0].metadata["business_type"] == business_type 
\ No newline at end of file
+        assert results[0]['metadata']["business_type"] == business_type